@@ -0,0 +1,85 @@
+import argparse
+import sys
+from crossword.batch import FORMATS, read_puzzles, run_batch
+from crossword.cache import LayoutCache
+from crossword.crossing import ORDERINGS
+from crossword.solver import SOLVERS
+
+
+def parse_dimensions(value):
+    dimensions = tuple(int(d) for d in value.split(','))
+    if not dimensions or any(d not in (2, 3) for d in dimensions):
+        raise argparse.ArgumentTypeError('dimensions must be a comma separated list of 2 and 3')
+    return dimensions
+
+
+def add_puzzle_arguments(parser):
+    parser.add_argument('--dimensions', type=parse_dimensions, default=(2, 3),
+                        help='comma separated dimensions to generate (default: 2,3)')
+    parser.add_argument('--scale-factor', type=float, default=1)
+    parser.add_argument('--max-depth', type=int, default=5)
+    parser.add_argument('--autogen', action='store_true', help='increase the scale factor until a layout is found')
+    parser.add_argument('--solver', choices=SOLVERS, default='greedy')
+    parser.add_argument('--ordering', choices=ORDERINGS, default='length')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--time-budget', type=float,
+                        help='seconds per puzzle and dimension, after which the best partial layout is returned')
+    parser.add_argument('--cache', metavar='DIRECTORY', help='reuse layouts stored in this directory')
+
+
+def get_puzzle_options(args):
+    return dict(scale_factor=args.scale_factor, max_depth=args.max_depth, autogen=args.autogen,
+                solver=args.solver, ordering=args.ordering, seed=args.seed, time_budget=args.time_budget,
+                cache=LayoutCache(args.cache) if args.cache else None)
+
+
+def batch(args):
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        num_puzzles, num_solved = run_batch(read_puzzles(args.input, args.format), output, args.workers,
+                                            args.max_in_flight, args.dimensions, **get_puzzle_options(args))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f'{num_solved} of {num_puzzles} puzzles solved', file=sys.stderr)
+
+
+def serve(args):
+    # Imported here so batch runs do not load the HTTP server.
+    from crossword.server import serve
+    serve(args.host, args.port, verbose=not args.quiet, workers=args.workers, max_queue=args.max_queue,
+          dimensions=args.dimensions, render=args.html, **get_puzzle_options(args))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m crossword')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = commands.add_parser('batch', help='solve a file of puzzles, streaming results as JSON lines')
+    batch_parser.add_argument('input', help='JSONL file of puzzle records, or a data.json of named puzzles')
+    batch_parser.add_argument('-o', '--output', default='-', help='JSONL results file (default: stdout)')
+    batch_parser.add_argument('--format', choices=FORMATS, default='auto',
+                              help='input format, by file extension when auto')
+    batch_parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    batch_parser.add_argument('--max-in-flight', type=int,
+                              help='puzzles submitted ahead of the results (default: twice the workers)')
+    add_puzzle_arguments(batch_parser)
+    batch_parser.set_defaults(run=batch)
+
+    serve_parser = commands.add_parser('serve', help='run an HTTP server solving queued puzzles')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    serve_parser.add_argument('--max-queue', type=int, default=64,
+                              help='jobs waiting for a worker before new ones are refused (default: 64)')
+    serve_parser.add_argument('--html', action='store_true', help='include the rendered HTML in job results')
+    serve_parser.add_argument('--quiet', action='store_true', help='do not log requests')
+    add_puzzle_arguments(serve_parser)
+    serve_parser.set_defaults(run=serve)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+import contextlib
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from crossword import parallel
+from crossword.parallel import StopFlag, init_worker
+
+# Searches a pool can run or queue at once, each with its own stop flag.
+MAX_JOBS = 256
+
+default_pool = None
+
+
+def generate_puzzle(puzzle, dimension, slot):
+    """Searches and renders one puzzle in a worker, returning (layout, html) or None."""
+    stop_event = StopFlag(parallel.stop_flags, slot)
+    with contextlib.redirect_stdout(io.StringIO()):
+        layout = puzzle.solve(dimension, stop_event)
+        if layout is None:
+            return None
+        html, = puzzle.render(layout).values()
+        return layout, html
+
+
+class PuzzlePool:
+
+    """Process pool running puzzle searches for an event loop.
+
+    Each call gets a slot in a shared array of stop flags. Cancelling the
+    awaiting coroutine sets its flag, which ends the worker's search, and
+    the slot is reused once the worker has returned. The parallel search
+    modes (workers, portfolio, parallel_scales) run to completion.
+    """
+
+    def __init__(self, workers=None, max_jobs=MAX_JOBS):
+        context = multiprocessing.get_context()
+        self.flags = context.RawArray('b', max_jobs)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                            initializer=init_worker, initargs=(self.flags,))
+        self.max_jobs = max_jobs
+        self.slots = None
+
+    async def generate(self, puzzle, dimension):
+        loop = asyncio.get_running_loop()
+        if self.slots is None:
+            self.slots = asyncio.Queue()
+            for slot in range(self.max_jobs):
+                self.slots.put_nowait(slot)
+        slot = await self.slots.get()
+        self.flags[slot] = 0
+        job = self.executor.submit(generate_puzzle, puzzle, dimension, slot)
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self.slots.put_nowait, slot))
+        try:
+            return await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            self.flags[slot] = 1
+            raise
+
+    def shutdown(self):
+        for slot in range(self.max_jobs):
+            self.flags[slot] = 1
+        self.executor.shutdown()
+
+
+def get_default_pool():
+    global default_pool
+    if default_pool is None:
+        default_pool = PuzzlePool()
+    return default_pool
@@ -0,0 +1,84 @@
+from collections import Counter
+import math
+
+
+class FeasibilityAnalysis:
+
+    """Checks a word list for layouts that can never exist, before any search.
+
+    Words are linked when they share a letter, and every placed word must
+    cross another, so the words have to form one connected component. The
+    smallest board is bounded by the longest word and by how many cells the
+    letters need: a cell is shared by at most one word per axis, and only by
+    words that contain its letter.
+    """
+
+    def __init__(self, words, dimension=2):
+        self.words = words
+        self.dimension = dimension
+        self.pivot_length = max(map(len, words), default=0)
+        self.components = self.find_components()
+        self.isolated_words = [component[0] for component in self.components if len(component) == 1] \
+            if len(words) > 1 else []
+        self.min_cells = self.count_min_cells()
+        self.min_length = self.get_min_length()
+
+    def find_components(self):
+        parents = list(range(len(self.words)))
+
+        def find(i):
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        letter_owners = {}
+        for i, word in enumerate(self.words):
+            for letter in set(word):
+                j = letter_owners.setdefault(letter, i)
+                parents[find(i)] = find(j)
+
+        components = {}
+        for i, word in enumerate(self.words):
+            components.setdefault(find(i), []).append(word)
+        return sorted(components.values(), key=len, reverse=True)
+
+    def count_min_cells(self):
+        totals = Counter()
+        most = Counter()
+        owners = Counter()
+        for word in self.words:
+            counts = Counter(word)
+            totals.update(counts)
+            owners.update(counts.keys())
+            for letter, count in counts.items():
+                most[letter] = max(most[letter], count)
+
+        # A word passes through a cell once, so a letter needs at least as
+        # many cells as its most frequent single-word use.
+        return sum(max(most[letter], -(-totals[letter] // min(self.dimension, owners[letter])))
+                   for letter in totals)
+
+    def get_min_length(self):
+        length = self.pivot_length
+        while length ** self.dimension < self.min_cells:
+            length += 1
+        return length
+
+    def is_feasible(self):
+        return len(self.components) <= 1
+
+    def get_min_scale_factor(self, scale_factor):
+        # Same 0.1 steps as the autogen loop, so the board length matches.
+        while math.floor(self.pivot_length * scale_factor) < self.min_length:
+            scale_factor += 0.1
+        return scale_factor
+
+    def get_diagnostic(self):
+        if self.is_feasible():
+            return f'Words need a board of at least {self.min_length} cells per side.'
+        diagnostic = f'Words form {len(self.components)} groups that share no letters: '
+        diagnostic += '; '.join(', '.join(component) for component in self.components)
+        if self.isolated_words:
+            diagnostic += f'. Words sharing no letter with any other word: {", ".join(self.isolated_words)}'
+        return diagnostic + '.'
@@ -0,0 +1,213 @@
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from crossword.puzzle import CrosswordPuzzle
+
+# Characters read at a time when streaming a multi-puzzle JSON object.
+CHUNK_SIZE = 65536
+FORMATS = ('auto', 'jsonl', 'json')
+
+
+def iter_jsonl(f):
+    """Yields the records of a JSONL file, and a ValueError for each line that is not a JSON object."""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if line:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield ValueError(f'Invalid JSON on line {number}: {e}')
+                continue
+            if isinstance(record, dict):
+                yield record
+            else:
+                yield ValueError(f'Line {number} is not a JSON object.')
+
+
+def iter_json_object(f):
+    """Yields the (key, value) pairs of a top-level JSON object one at a time.
+
+    Only the entry being decoded is held in memory, so a data.json with
+    many puzzles is read in flat memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+
+    def fill():
+        nonlocal buffer, position
+        chunk = f.read(CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        return bool(chunk)
+
+    def skip_space():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position:position + 1]
+
+    def expect(characters):
+        nonlocal position
+        character = skip_space()
+        if not character or character not in characters:
+            raise ValueError(f'Expected one of {characters!r} in JSON input, found {character!r}.')
+        position += 1
+        return character
+
+    def decode():
+        nonlocal position
+        skip_space()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            # A number may continue past the end of the buffer.
+            if end == len(buffer) and fill():
+                continue
+            position = end
+            return value
+
+    expect('{')
+    if skip_space() == '}':
+        return
+    while True:
+        key = decode()
+        expect(':')
+        yield key, decode()
+        if expect(',}') == '}':
+            return
+
+
+def read_puzzles(path, format='auto'):
+    """Yields puzzle records ({'name', 'words', 'clues'}) from a JSONL or data.json file.
+
+    A JSONL line that cannot be decoded is yielded as a ValueError, so the
+    puzzles after it can still be solved.
+    """
+    if format not in FORMATS:
+        raise ValueError(f'Unknown input format: {format}')
+    if format == 'auto':
+        format = 'json' if path.endswith('.json') else 'jsonl'
+    with open(path, 'r') as f:
+        if format == 'jsonl':
+            yield from iter_jsonl(f)
+        else:
+            for name, words in iter_json_object(f):
+                yield {'name': name, 'words': words}
+
+
+def get_words_and_clues(record):
+    words = record['words']
+    if isinstance(words, dict):
+        return list(words.keys()), list(words.values())
+    words = list(words)
+    return words, list(record.get('clues', [''] * len(words)))
+
+
+def solve_puzzle(index, record, dimensions, options, render=False):
+    """Solves one puzzle record in every dimension and returns its result record.
+
+    The puzzle's progress messages are captured, and the last one is kept
+    as the message of a dimension that could not be generated. With render
+    set, each layout's HTML is included as well.
+    """
+    result = {'index': index, 'name': str(index), 'results': []}
+    try:
+        result['name'] = record.get('name', result['name'])
+        words, clues = get_words_and_clues(record)
+    except (KeyError, TypeError, AttributeError) as e:
+        result['status'] = 'error'
+        result['message'] = f'Invalid puzzle record: {e!r}'
+        return result
+
+    for dimension in dimensions:
+        puzzle = CrosswordPuzzle(result['name'], '', words, clues, **options)
+        output = io.StringIO()
+        start = time.perf_counter()
+        entry = {'dimension': dimension}
+        try:
+            with contextlib.redirect_stdout(output):
+                layout = puzzle.solve(dimension)
+        except Exception as e:
+            layout = None
+            entry['status'] = 'error'
+            entry['message'] = repr(e)
+        else:
+            entry['status'] = 'ok' if layout is not None else 'failed'
+            if layout is None:
+                lines = output.getvalue().splitlines()
+                entry['message'] = lines[-1] if lines else ''
+        entry['seconds'] = round(time.perf_counter() - start, 6)
+        if layout is not None:
+            entry['scale_factor'] = round(layout.scale_factor, 6)
+            entry['length'] = layout.length
+            entry['layout'] = layout.describe()
+            if layout.unplaced:
+                # The time budget ran out first.
+                entry['status'] = 'partial'
+                entry['unplaced'] = layout.unplaced
+            if render:
+                entry['html'], = puzzle.render(layout).values()
+        result['results'].append(entry)
+
+    statuses = {entry['status'] for entry in result['results']}
+    for status in ('error', 'failed', 'partial', 'ok'):
+        if status in statuses:
+            result['status'] = status
+            break
+    return result
+
+
+def run_batch(puzzles, output, workers=None, max_in_flight=None, dimensions=(2, 3), **options):
+    """Solves a stream of puzzle records across a process pool.
+
+    At most max_in_flight puzzles (twice the workers by default) are read
+    ahead of the results, and each result record is written to output as
+    one JSON line as soon as its puzzle finishes, so results may arrive
+    out of input order. A ValueError in place of a record, e.g. a malformed
+    JSONL line, is written as an error result. Returns the number of
+    puzzles and of those solved.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    if max_in_flight < 1:
+        raise ValueError('max_in_flight must be at least 1.')
+    num_puzzles = num_solved = 0
+
+    def write(result):
+        nonlocal num_solved
+        num_solved += result['status'] == 'ok'
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        try:
+            for record in puzzles:
+                if isinstance(record, ValueError):
+                    write({'index': num_puzzles, 'name': str(num_puzzles), 'results': [], 'status': 'error',
+                           'message': str(record)})
+                    num_puzzles += 1
+                    continue
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+                pending.add(executor.submit(solve_puzzle, num_puzzles, record, dimensions, options))
+                num_puzzles += 1
+        finally:
+            # Puzzles already submitted are written even when reading the input fails.
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+    return num_puzzles, num_solved
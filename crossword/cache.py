@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+DEFAULT_DIRECTORY = '.crossword_cache'
+
+
+def get_cache_key(words, dimension, scale_factor, options):
+    """Hashes everything a search's layout depends on, except the order of the words."""
+    data = json.dumps([sorted(words), dimension, scale_factor, options], sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class LayoutCache:
+
+    """Layout records on disk, one JSON file per key, with the hottest also kept in memory.
+
+    Files are written to a temporary name and moved into place, so processes
+    sharing a directory never read a half-written entry. Reading an entry
+    touches its file, and the least recently used files are removed once the
+    directory grows past max_size bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_size=64 * 2**20, memory_capacity=128):
+        self.directory = directory
+        self.max_size = max_size
+        self.memory_capacity = memory_capacity
+        self.memory = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def remember(self, key, record):
+        if self.memory_capacity <= 0:
+            return
+        self.memory[key] = record
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_capacity:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        record = self.memory.get(key)
+        path = self.get_path(key)
+        if record is None:
+            try:
+                with open(path, 'r') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted from disk by another process; the memory copy is still good.
+            pass
+        self.remember(key, record)
+        return record
+
+    def put(self, key, record):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(record, f)
+            os.replace(temporary_path, self.get_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self.remember(key, record)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        size = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                size += stat.st_size
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        self.memory.clear()
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
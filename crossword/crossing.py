@@ -0,0 +1,78 @@
+from array import array
+from collections import Counter
+
+
+class CrossingTable:
+
+    """Static table of shared letters between every pair of words.
+
+    crossings[i][j] holds the matching (offset_i, offset_j) pairs of words i
+    and j flattened into an array, so the table is built once per word list.
+    """
+
+    def __init__(self, words):
+        typecode = 'B' if max(map(len, words), default=0) < 256 else 'H'
+        letter_offsets = []
+        for word in words:
+            offsets = {}
+            for k, letter in enumerate(word):
+                offsets.setdefault(letter, []).append(k)
+            letter_offsets.append(offsets)
+
+        self.crossings = [{} for _ in words]
+        for i in range(len(words)):
+            for j in range(i + 1, len(words)):
+                forward = array(typecode)
+                backward = array(typecode)
+                for letter, offsets_i in letter_offsets[i].items():
+                    for offset_j in letter_offsets[j].get(letter, ()):
+                        for offset_i in offsets_i:
+                            forward.extend((offset_i, offset_j))
+                            backward.extend((offset_j, offset_i))
+                if forward:
+                    self.crossings[i][j] = forward
+                    self.crossings[j][i] = backward
+
+        self.options = [sum(len(pairs) // 2 for pairs in row.values()) for row in self.crossings]
+        self.offset_counts = [self.count_offsets(i) for i in range(len(words))]
+        self.offsets = [sorted(counts, key=lambda k: (counts[k], k)) for counts in self.offset_counts]
+
+    def count_offsets(self, i):
+        counts = Counter()
+        for pairs in self.crossings[i].values():
+            counts.update(pairs[::2])
+        return counts
+
+    def get_pairs(self, i, j):
+        pairs = self.crossings[i].get(j, ())
+        return list(zip(pairs[::2], pairs[1::2]))
+
+
+ORDERINGS = ('length', 'constrained')
+
+
+def get_order_keys(words, ordering):
+    if ordering == 'length' or len(words) < 3:
+        return [-len(word) for word in words]
+    if ordering == 'constrained':
+        # Try the words with the fewest possible crossings first.
+        options = CrossingTable(words).options
+        return [(options[i], -len(word)) for i, word in enumerate(words)]
+    raise ValueError(f'Unknown word ordering: {ordering}')
+
+
+def order_words(words, ordering='length'):
+    # The longest word stays first as the pivot.
+    words = sorted(words, key=len, reverse=True)
+    keys = get_order_keys(words, ordering)
+    rest = sorted(range(1, len(words)), key=lambda i: keys[i])
+    return words[:1] + [words[i] for i in rest]
+
+
+def rank_words(words, ordering='length'):
+    """Ranks the words of order_words(words, ordering) by their ordering key.
+
+    Words of equal rank tie on the key, while the pivot word ranks alone.
+    """
+    keys = get_order_keys(words, ordering)
+    return [0] + [keys.index(key, 1) for key in keys[1:]]
@@ -1,165 +1,412 @@
+from crossword.crossing import CrossingTable, order_words, rank_words
+from crossword.grid import get_centered_index
+from crossword.restarts import RESTART_SCHEDULES, get_pivot_permutation
+from crossword.runs import RunIndex
+from crossword.transposition import TranspositionTable, ZobristKeys
+from crossword.trie import WordTrie
 from crossword.word import Word3D
 import math
-from collections import deque
+import random
+import time
+from itertools import islice
+
+
+class DictCube:
+
+    """Nested dict cube storage indexed as letters[z][y][x]."""
+
+    def __init__(self, length, empty_space, alphabet=''):
+        self.length = length
+        self.empty_space = empty_space
+        self.letters = self.init_layers(empty_space)
+        self.counts = self.init_layers(0)
+
+    def init_layers(self, value):
+        cube = {}
+        for k in range(self.length):
+            layer = {}
+            for j in range(self.length):
+                row = {}
+                for i in range(self.length):
+                    row[i] = value
+                layer[j] = row
+            cube[k] = layer
+        return cube
+
+    def __getitem__(self, z):
+        return self.letters[z]
+
+    def get_letter(self, x, y, z):
+        return self.letters[z][y][x]
+
+    def set_letter(self, x, y, z, letter):
+        self.letters[z][y][x] = letter
+
+    def get_count(self, x, y, z):
+        return self.counts[z][y][x]
+
+    def increment_count(self, x, y, z):
+        self.counts[z][y][x] += 1
+
+    def decrement_count(self, x, y, z):
+        if self.counts[z][y][x] > 0:
+            self.counts[z][y][x] -= 1
+
+
+class FlatCube:
+
+    """Contiguous voxel storage indexed as z*length**2 + y*length + x.
+
+    Letters are stored as uint8 codes into `alphabet` (code 0 is the empty
+    space) and counts as unsigned bytes.
+    """
+
+    def __init__(self, length, empty_space, alphabet=''):
+        self.length = length
+        self.area = length * length
+        self.empty_space = empty_space
+        self.alphabet = [empty_space] + sorted(set(alphabet) - {empty_space})
+        if len(self.alphabet) > 256:
+            raise ValueError('Flat storage supports at most 255 distinct letters.')
+        self.codes = {letter: code for code, letter in enumerate(self.alphabet)}
+        size = self.area * length
+        self.letters = bytearray(size)
+        self.counts = bytearray(size)
+
+    def __getitem__(self, z):
+        n = self.length
+        start = z * self.area
+        return [
+            [self.alphabet[code] for code in self.letters[row:row + n]]
+            for row in range(start, start + self.area, n)
+        ]
+
+    def get_letter(self, x, y, z):
+        return self.alphabet[self.letters[z * self.area + y * self.length + x]]
+
+    def set_letter(self, x, y, z, letter):
+        self.letters[z * self.area + y * self.length + x] = self.codes[letter]
+
+    def get_count(self, x, y, z):
+        return self.counts[z * self.area + y * self.length + x]
+
+    def increment_count(self, x, y, z):
+        self.counts[z * self.area + y * self.length + x] += 1
+
+    def decrement_count(self, x, y, z):
+        i = z * self.area + y * self.length + x
+        if self.counts[i] > 0:
+            self.counts[i] -= 1
+
+
+class SparseCube:
+
+    """Occupied-cell cube storage for large, mostly empty cubes.
+
+    Cells are keyed by their packed coordinate z*length**2 + y*length + x and
+    the occupied x coordinates of each row are indexed for rendering, so
+    memory scales with the number of letters, not the volume.
+    """
+
+    def __init__(self, length, empty_space, alphabet=''):
+        self.length = length
+        self.area = length * length
+        self.empty_space = empty_space
+        self.letters = {}
+        self.counts = {}
+        self.rows = {}
+
+    def __getitem__(self, z):
+        n = self.length
+        layer = [[self.empty_space] * n for _ in range(n)]
+        for y in range(n):
+            for x in self.rows.get(z * n + y, ()):
+                layer[y][x] = self.letters[z * self.area + y * n + x]
+        return layer
+
+    def get_letter(self, x, y, z):
+        return self.letters.get(z * self.area + y * self.length + x, self.empty_space)
+
+    def set_letter(self, x, y, z, letter):
+        key = z * self.area + y * self.length + x
+        if letter == self.empty_space:
+            if self.letters.pop(key, None) is not None:
+                row = z * self.length + y
+                occupied = self.rows[row]
+                occupied.discard(x)
+                if not occupied:
+                    del self.rows[row]
+            return
+        if key not in self.letters:
+            self.rows.setdefault(z * self.length + y, set()).add(x)
+        self.letters[key] = letter
+
+    def get_count(self, x, y, z):
+        return self.counts.get(z * self.area + y * self.length + x, 0)
+
+    def increment_count(self, x, y, z):
+        key = z * self.area + y * self.length + x
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def decrement_count(self, x, y, z):
+        key = z * self.area + y * self.length + x
+        count = self.counts.get(key, 0)
+        if count > 1:
+            self.counts[key] = count - 1
+        elif count:
+            del self.counts[key]
+
+
+CUBE_STORAGE = {'dict': DictCube, 'flat': FlatCube, 'sparse': SparseCube}
+
+# Cubes with more cells than this use sparse storage when storage='auto'.
+SPARSE_CUBE_VOLUME = 32 ** 3
 
 
 class Cube:
 
-    def __init__(self, words, scale_factor, empty_space='-', max_depth=5):
-        self.word_list = sorted(words, key=len, reverse=True)
+    dimension = 3
+
+    def __init__(self, words, scale_factor, empty_space='-', max_depth=5, storage='auto', ordering='length', table_size=65536,
+                 seed=None, restarts='luby', deadline=None, time_budget=None):
+        if storage != 'auto' and storage not in CUBE_STORAGE:
+            raise ValueError(f'Unknown cube storage: {storage}')
+        self.word_list = order_words(words, ordering)
+        self.word_ranks = rank_words(self.word_list, ordering)
         self.empty_space = empty_space
         self.num_words = len(words)
+        self.pivot_word_length = len(self.word_list[0])
+        self.length = math.floor(self.pivot_word_length * scale_factor)
         self.words = self.init_words()
         self.pivot_word = self.words[0]
-        self.pivot_word_length = self.pivot_word.length
-        self.length = math.floor(self.pivot_word_length * scale_factor)
-        self.cube = self.init_cube(empty_space)
-        self.cube_count = self.init_cube(0)
+        # 'auto' is kept and resolved again whenever the cube is resized.
+        self.storage = storage
+        self.cube = self.init_cube()
+        self.runs = RunIndex(self.length, 3)
+        if restarts not in RESTART_SCHEDULES:
+            raise ValueError(f'Unknown restart schedule: {restarts}')
+        # Without a seed the search stays deterministic and resets after max_depth.
+        self.random = random.Random(seed) if seed is not None else None
+        self.restart_schedule = RESTART_SCHEDULES[restarts]
+        self.num_restarts = 0
         self.max_length = self.length - self.pivot_word_length
+        self.pivot_start = 0
+        self.pivot_step = 1
         self.pivot_positions = self.get_pivot_positions()
-        self.num_pivots = len(self.pivot_positions) - 1
+        self.num_pivots = self.count_pivot_positions()
         self.pivot_index = 0
         self.depth = 0
         self.max_depth = max_depth
         self.indexes = set(range(self.num_words))
         self.inserted_indexes = set()
+        self.trie = WordTrie(self.word_list)
+        self.crossings = CrossingTable(self.word_list)
+        self.letter_cells = {}
+        self.trail = []
+        self.zobrist = ZobristKeys()
+        self.hash = 0
+        self.failed_states = TranspositionTable(table_size)
+        self.dead_end = False
+        self.stop_event = None
+        # A time.monotonic() value; time_budget counts from construction.
+        if time_budget is not None:
+            budget_deadline = time.monotonic() + time_budget
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        self.deadline = deadline
+        self.best_layout = []
+        self.layout_sink = None
 
     def get_remaining_indexes(self):
         return self.indexes - self.inserted_indexes
 
-    def get_pivot_positions(self, centered=True):
-        if self.length == self.pivot_word_length:
-            return [z*self.length**2 for z in range(self.length)]
+    def add_inserted_index(self, index):
+        self.inserted_indexes.add(index)
+        self.trie.mark_placed(index)
 
+    def remove_inserted_index(self, index):
+        self.inserted_indexes.remove(index)
+        self.trie.mark_unplaced(index)
+
+    def count_pivot_positions(self):
+        # The pivot always runs along x, which covers the other axes by
+        # permuting them. Swapping y and z keeps it along x, so only y <= z
+        # is kept. Reflections would reverse the words.
         n = self.length
-        coordinates = [(x, y, z) for x in range(self.max_length) for y in range(n) for z in range(n)]
-        positions = [z*n**2 + y*n + x for (x, y, z) in coordinates]
+        return max(self.max_length + 1, 0) * n * (n + 1) // 2
 
-        if not centered:
-            return positions
-        
-        centered_positions = []
+    def select_pivots(self, start, step):
+        # Restricts the search to every step-th pivot, e.g. one share per worker.
+        self.pivot_start = start
+        self.pivot_step = step
+        self.pivot_positions = self.get_pivot_positions()
+        self.num_pivots = len(range(start, self.count_pivot_positions(), step))
 
-        for (p1,p2) in zip(positions[:len(positions)//2][::-1], positions[len(positions)//2:]):
-            centered_positions.append(p1)
-            centered_positions.append(p2)
+    def get_pivot_positions(self, centered=True):
+        return islice(self.iter_pivot_positions(centered), self.pivot_start, None, self.pivot_step)
 
-        return centered_positions
+    def iter_pivot_positions(self, centered=True):
+        n = self.length
+        num_positions = max(self.max_length + 1, 0) * n * n
+        if self.random is not None:
+            permutation = get_pivot_permutation(self.random, num_positions)
+        for i in range(num_positions):
+            if self.random is not None:
+                i = permutation(i)
+            elif centered:
+                i = get_centered_index(i, num_positions)
+            x, i = divmod(i, n * n)
+            y, z = divmod(i, n)
+            if y <= z:
+                yield (x, y, z)
         
     def init_words(self, words=[]):
         words = self.word_list if not words else words
         word_objects = {}
         for i, word in enumerate(words):
-            word_obj = Word3D(word, i)
+            word_obj = Word3D(word, i, board_length=self.length)
             if (i + 1) % 2 == 0:
                 word_obj.rotate()
             word_objects[i] = word_obj
+        self.initial_orientations = [word.get_orientation() for word in word_objects.values()]
         return word_objects
     
-    def init_cube(self, value):
-        cube = {}
-        for k in range(self.length):
-            layer = {}
-            for j in range(self.length):
-                row = {}
-                for i in range(self.length):
-                    row[i] = value
-                layer[j] = row
-            cube[k] = layer
-        return cube
+    def select_storage(self):
+        if self.storage != 'auto':
+            return self.storage
+        return 'sparse' if self.length ** 3 > SPARSE_CUBE_VOLUME else 'flat'
+
+    def init_cube(self):
+        return CUBE_STORAGE[self.select_storage()](self.length, self.empty_space, ''.join(self.word_list))
 
     def update_cube(self, word):
         for i in range(word.length):
-            self.cube[word.z + i * word.z_sign][word.y + i * word.y_sign][word.x + i * word.x_sign] = word.value[i]
+            x = word.x + i * word.x_sign
+            y = word.y + i * word.y_sign
+            z = word.z + i * word.z_sign
+            if self.cube.get_letter(x, y, z) == self.empty_space:
+                self.runs.add(self.get_cell(x, y, z), word.value[i])
+            self.cube.set_letter(x, y, z, word.value[i])
+        self.add_letter_cells(word)
+
+    def add_letter_cells(self, word):
+        orientation = word.get_orientation()
+        for i, letter in enumerate(word.value):
+            cells = self.letter_cells.setdefault(letter, {})
+            cell = (word.x + i * word.x_sign, word.y + i * word.y_sign, word.z + i * word.z_sign, orientation)
+            cells[cell] = cells.get(cell, 0) + 1
+
+    def remove_letter_cells(self, word):
+        orientation = word.get_orientation()
+        for i, letter in enumerate(word.value):
+            cells = self.letter_cells[letter]
+            cell = (word.x + i * word.x_sign, word.y + i * word.y_sign, word.z + i * word.z_sign, orientation)
+            if cells[cell] > 1:
+                cells[cell] -= 1
+            else:
+                del cells[cell]
+
+    def place(self, word):
+        self.increment_cube_count(word)
+        self.update_cube(word)
+        self.add_inserted_index(word.index)
+        self.trail.append(word.index)
+        self.hash ^= self.get_word_key(word)
+
+    def get_word_key(self, word):
+        return self.zobrist.get_key(word.index, word.generate_insertion_entry())
+
+    def get_depth_limit(self):
+        if self.random is None:
+            return self.max_depth
+        return self.max_depth * self.restart_schedule(self.num_restarts + 1)
+
+    def get_word_order(self):
+        # A seed only shuffles the remaining words whose ordering keys tie.
+        indexes = self.get_remaining_indexes()
+        if self.random is None:
+            return indexes
+        return sorted(indexes, key=lambda i: (self.word_ranks[i], self.random.random()))
+
+    def get_search_order(self, items):
+        items = list(items)
+        if self.random is not None:
+            self.random.shuffle(items)
+        return items
+
+    def get_anchor_offsets(self, word):
+        offsets = self.crossings.offsets[word.index]
+        if self.random is None:
+            return offsets
+        # Keep the rarest letters first but break ties at random.
+        counts = self.crossings.offset_counts[word.index]
+        return sorted(offsets, key=lambda k: (counts[k], self.random.random()))
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def rollback(self, checkpoint=0):
+        while len(self.trail) > checkpoint:
+            self.remove(self.words[self.trail[-1]])
 
     def reset(self):
         self.depth = 0
-        self.words = self.init_words()
-        self.inserted_indexes = set()
-        self.cube_count = self.init_cube(0)
-        self.cube = self.init_cube(self.empty_space)
+        self.rollback()
+        for word in self.words.values():
+            word.clear_insertion_history()
+            while word.get_orientation() != self.initial_orientations[word.index]:
+                word.rotate()
 
     def increment_cube_count(self, word):
         for i in range(word.length):
             x = word.x + i * word.x_sign
             y = word.y + i * word.y_sign
             z = word.z + i * word.z_sign
-            self.cube_count[z][y][x] += 1
+            self.cube.increment_count(x, y, z)
 
     def decrement_cube_count(self, word):
         for i in range(word.length):
             x = word.x + i * word.x_sign
             y = word.y + i * word.y_sign
             z = word.z + i * word.z_sign
-            if self.cube_count[z][y][x] > 0:
-                self.cube_count[z][y][x] -= 1
+            self.cube.decrement_count(x, y, z)
 
     def print_cube(self):
         print('---Start Cube---')
         for k in range(self.length):
             print(f'Layer {k}')
             for j in range(self.length):
-                row = ''
-                for i in range(self.length):
-                    row += self.cube[k][j][i]
-                print(row)
+                print(''.join(self.cube.get_letter(i, j, k) for i in range(self.length)))
             print('\n')
         print('---End Cube---')
 
-    def check_word_ends(self, word):
-        x_sign, y_sign, z_sign = word.x_sign, word.y_sign, word.z_sign
-        max_len = self.length - 1
-
-        x_prev = word.x - x_sign
-        y_prev = word.y - y_sign
-        z_prev = word.z - z_sign
-        x_next = word.x + x_sign*word.length
-        y_next = word.y + y_sign*word.length
-        z_next = word.z + z_sign*word.length
-
-        first_letter = word.value[0]
-        last_letter = word.value[-1]
-        prev_letter = self.cube[max(z_prev, 0)][max(y_prev, 0)][max(x_prev, 0)]
-        next_letter = self.cube[min(z_next, max_len)][min(y_next, max_len)][min(x_next, max_len)]
+    def get_cell(self, x, y, z):
+        return (z*self.length + y)*self.length + x
 
+    def check_word_ends(self, word):
+        x_prev = word.x - word.x_sign
+        y_prev = word.y - word.y_sign
+        z_prev = word.z - word.z_sign
+        x_next = word.x + word.x_sign*word.length
+        y_next = word.y + word.y_sign*word.length
+        z_next = word.z + word.z_sign*word.length
+
+        # Any occupied cell blocks a word from ending next to it.
+        if self.is_valid_position(x_prev, y_prev, z_prev) and self.runs.is_occupied(self.get_cell(x_prev, y_prev, z_prev)):
+            return False
 
-        if x_prev < 0 and y_prev < 0 and z_prev < 0:
-            if prev_letter != first_letter and prev_letter != self.empty_space:
-                return False
-        
-        if x_prev >= 0 and y_prev >= 0 and z_prev >= 0:
-            if prev_letter != self.empty_space:
-                return False
-        
-        if x_next > max_len and y_next > max_len and z_next > max_len:
-            if next_letter != last_letter and next_letter != self.empty_space:
-                return False
-        
-        if x_next <= max_len and y_next <= max_len and z_next <= max_len:
-            if next_letter != self.empty_space:
-                return False
+        if self.is_valid_position(x_next, y_next, z_next) and self.runs.is_occupied(self.get_cell(x_next, y_next, z_next)):
+            return False
         return True
     
     def get_intersections(self, x_test, y_test, z_test, test_orientation, direction):
-        u_sign, v_sign, w_sign = test_orientation
-        starting_coordinattes = None
-        letters = ''
-
-        if self.is_valid_position(x_test, y_test, z_test):
-            min_space = self.cube[z_test][y_test][x_test]
-            if min_space != self.empty_space:
-                xk = x_test
-                yk = y_test
-                zk = z_test
-
-                while self.is_valid_position(xk, yk, zk) and self.cube[zk][yk][xk] != self.empty_space:
-                    if not starting_coordinattes and direction != 1:
-                        starting_coordinattes = (xk, yk, zk)
-                    letters += self.cube[zk][yk][xk]
-                    xk += direction*u_sign
-                    yk += direction*v_sign
-                    zk += direction*w_sign
-        return letters[::direction], starting_coordinattes
+        if not self.is_valid_position(x_test, y_test, z_test):
+            return '', None
+
+        axis = test_orientation.index(1)
+        letters = self.runs.get_letters(self.get_cell(x_test, y_test, z_test), axis, direction)
+        if letters and direction != 1:
+            return letters, (x_test, y_test, z_test)
+        return letters, None
     
     def check_insertion(self, word, offset, recursive=True):
         x_sign = word.x_sign
@@ -228,7 +475,7 @@ class Cube:
             letters_b = letters_b_min + word_letter + letters_b_max
 
             # Check inline.
-            inline_space = self.cube[z + i*z_sign][y + i*y_sign][x + i*x_sign]
+            inline_space = self.cube.get_letter(x + i*x_sign, y + i*y_sign, z + i*z_sign)
             if inline_space not in (word_letter, self.empty_space):
                 return False
 
@@ -236,25 +483,15 @@ class Cube:
             len_letters_b = len(letters_b)
 
             matching_words_a, matching_words_b = [], []
-            remaining_indexes = self.get_remaining_indexes()
 
             if len_letters_a > 1:
-                for i in remaining_indexes:
-                    remaining_word = self.words[i]
-                    if remaining_word.value[:len_letters_a] == letters_a and i != word.index:
-                        matching_words_a.append(remaining_word)
-            if len_letters_b > 1:
-                for i in remaining_indexes:
-                    remaining_word = self.words[i]
-                    if remaining_word.value[:len_letters_b] == letters_b and i != word.index:
-                        matching_words_b.append(remaining_word)
-
-            if len_letters_a > 1 and not matching_words_a:
-                if letters_a not in self.word_list:
+                matching_words_a = [self.words[j] for j in self.trie.find_remaining(letters_a, word.index)]
+                if not matching_words_a and not self.trie.contains(letters_a):
                     return False
-            
-            if len_letters_b > 1 and not matching_words_b:
-                if letters_b not in self.word_list:
+
+            if len_letters_b > 1:
+                matching_words_b = [self.words[j] for j in self.trie.find_remaining(letters_b, word.index)]
+                if not matching_words_b and not self.trie.contains(letters_b):
                     return False
             
             if coordinates_a:
@@ -275,30 +512,30 @@ class Cube:
                     return False
         return True
     
-    def insert_pivot(self):
-        while not self.pivot_word.x_sign:
-            self.pivot_word.rotate()
+    def insert_pivot(self, pivot_word):
+        pivot_position = next(self.pivot_positions, None)
+        if pivot_position is None:
+            return False
+        self.pivot_index += 1
+        return self.place_pivot(pivot_word, pivot_position)
 
-        pivot_position = self.pivot_positions[self.pivot_index]
+    def place_pivot(self, pivot_word, pivot_position):
+        while not pivot_word.x_sign:
+            pivot_word.rotate()
 
-        pivot_length = self.pivot_word.length - 1
-        x = pivot_position % max(self.max_length, 1)
-        y = (pivot_position // self.length) % self.length
-        z = pivot_position // (self.length * self.length)
+        pivot_length = pivot_word.length - 1
+        x, y, z = pivot_position
             
-        max_x = x + pivot_length * self.pivot_word.x_sign
-        max_y = y + pivot_length * self.pivot_word.y_sign
-        max_z = z + pivot_length * self.pivot_word.z_sign
+        max_x = x + pivot_length * pivot_word.x_sign
+        max_y = y + pivot_length * pivot_word.y_sign
+        max_z = z + pivot_length * pivot_word.z_sign
 
         if not self.is_valid_position(max_x, max_y, max_z):
             return False
         
-        self.pivot_index += 1
-        self.pivot_word.update_position(x, y, z)
+        pivot_word.update_position(x, y, z)
 
-        self.update_cube(self.pivot_word)
-        self.increment_cube_count(self.pivot_word)
-        self.inserted_indexes.add(self.pivot_word.index)
+        self.place(pivot_word)
         return True
 
     def insert_at(self, word, x, y, z, orientation):
@@ -314,53 +551,132 @@ class Cube:
             return False
 
         insertion_entry = word.generate_insertion_entry()
-        if insertion_entry not in word.insertion_history and \
+        if not word.has_insertion_entry(insertion_entry) and \
             self.check_insertion(word, offset, recursive=False):
-                self.increment_cube_count(word)
                 word.add_insertion_entry(insertion_entry)
-                self.update_cube(word)
-                self.inserted_indexes.add(word.index)
+                self.place(word)
                 return True
         return False
 
     def insert(self, word):
         if not self.inserted_indexes:
-            return self.insert_pivot()
-        
-        inserted_indexes = set(self.inserted_indexes)
+            return self.insert_pivot(word)
         
-        for i in inserted_indexes:
-            inserted_word = self.words[i]
-            for j in range(inserted_word.length):
-                for k in range(word.length):
-                    if word.value[k] == inserted_word.value[j]:
-                        if word.get_orientation() == inserted_word.get_orientation():
-                            word.rotate()
-                        x = inserted_word.x + j * inserted_word.x_sign
-                        y = inserted_word.y + j * inserted_word.y_sign
-                        z = inserted_word.z + j * inserted_word.z_sign
-                        x_start = x - k * word.x_sign
-                        y_start = y - k * word.y_sign
-                        z_start = z - k * word.z_sign
-                        x_end = x_start + (word.length - 1) * word.x_sign
-                        y_end = y_start + (word.length - 1) * word.y_sign
-                        z_end = z_start + (word.length - 1) * word.z_sign
-
-                        if self.is_valid_position(x_start, y_start, z_start) and \
-                            self.is_valid_position(x_end, y_end, z_end):
-                            word.update_position(x_start, y_start, z_start)
-                            offset = k
-                            insertion_entry = word.generate_insertion_entry()
-
-                            if insertion_entry not in word.insertion_history and \
-                                self.check_insertion(word, offset):
-                                    self.increment_cube_count(word)
-                                    word.add_insertion_entry(insertion_entry)
-                                    self.update_cube(word)
-                                    self.inserted_indexes.add(word.index)
-                                    return True
+        for k in self.get_anchor_offsets(word):
+            for (x, y, z, orientation) in self.get_search_order(self.letter_cells.get(word.value[k], ())):
+                if word.get_orientation() == orientation:
+                    word.rotate()
+                x_start = x - k * word.x_sign
+                y_start = y - k * word.y_sign
+                z_start = z - k * word.z_sign
+                x_end = x_start + (word.length - 1) * word.x_sign
+                y_end = y_start + (word.length - 1) * word.y_sign
+                z_end = z_start + (word.length - 1) * word.z_sign
+
+                if self.is_valid_position(x_start, y_start, z_start) and \
+                    self.is_valid_position(x_end, y_end, z_end):
+                    word.update_position(x_start, y_start, z_start)
+                    offset = k
+                    insertion_entry = word.generate_insertion_entry()
+                    if not word.has_insertion_entry(insertion_entry):
+                        if self.check_insertion(word, offset):
+                            word.add_insertion_entry(insertion_entry)
+                            self.place(word)
+                            return True
+                    elif self.dead_end and self.hash ^ self.get_word_key(word) not in self.failed_states and \
+                        self.check_insertion(word, offset, recursive=False):
+                        # A placement tried before still leads to a board not known to fail.
+                        self.dead_end = False
         return False
     
+    def get_anchors(self, word, crossed_word=None):
+        if crossed_word is None:
+            return [(k, cell) for k in self.crossings.offsets[word.index]
+                    for cell in self.letter_cells.get(word.value[k], ())]
+
+        orientation = crossed_word.get_orientation()
+        return [(k, (crossed_word.x + j * crossed_word.x_sign,
+                     crossed_word.y + j * crossed_word.y_sign,
+                     crossed_word.z + j * crossed_word.z_sign,
+                     orientation))
+                for (k, j) in self.crossings.get_pairs(word.index, crossed_word.index)]
+
+    def get_placements(self, word, crossed_word=None):
+        placements = []
+        seen = set()
+        for k, (x, y, z, crossed_orientation) in self.get_anchors(word, crossed_word):
+            for orientation in ((1, 0, 0), (0, 1, 0), (0, 0, 1)):
+                if orientation == crossed_orientation:
+                    continue
+                x_start = x - k * orientation[0]
+                y_start = y - k * orientation[1]
+                z_start = z - k * orientation[2]
+                if (x_start, y_start, z_start, orientation) in seen or not self.is_valid_position(x_start, y_start, z_start):
+                    continue
+                seen.add((x_start, y_start, z_start, orientation))
+
+                self.set_placement(word, (x_start, y_start, z_start, orientation))
+                if self.check_insertion(word, k, recursive=False):
+                    placements.append((x_start, y_start, z_start, orientation))
+        word.clear_position()
+        return placements
+
+    def filter_placements(self, word, placements, cells):
+        # Only placements on or beside the line of one of the new cells can change.
+        kept = []
+        for placement in placements:
+            axis = placement[3].index(1)
+            start = placement[axis]
+            end = start + word.length
+            for cell in cells:
+                if start - 1 <= cell[axis] <= end and \
+                    sum(abs(cell[i] - placement[i]) for i in range(3) if i != axis) <= 1:
+                    self.set_placement(word, placement)
+                    if not self.check_insertion(word, -1, recursive=False):
+                        break
+                    kept.append(placement)
+                    break
+            else:
+                kept.append(placement)
+        word.clear_position()
+        return kept
+
+    def set_placement(self, word, placement):
+        x, y, z, orientation = placement
+        word.update_position(x, y, z)
+        while word.get_orientation() != orientation:
+            word.rotate()
+
+    def insert_placement(self, word, placement):
+        self.set_placement(word, placement)
+        cells = [(word.x + i * word.x_sign, word.y + i * word.y_sign, word.z + i * word.z_sign) for i in range(word.length)]
+        new_cells = [(x, y, z) for (x, y, z) in cells if not self.runs.is_occupied(self.get_cell(x, y, z))]
+        self.place(word)
+        return new_cells
+
+    def check_runs(self):
+        # Every run of letters must be a word or the start of a remaining one.
+        for texts in self.runs.texts:
+            for letters in texts.values():
+                if len(letters) > 1 and not self.trie.contains(letters) and not self.trie.find_remaining(letters):
+                    return False
+        return True
+
+    def get_cells(self, x, y, z, orientation, length):
+        x_sign, y_sign, z_sign = orientation
+        return {(x + i * x_sign, y + i * y_sign, z + i * z_sign) for i in range(length)}
+
+    def get_open_runs(self):
+        # Runs of letters that are not words yet, each with the placement that would complete it.
+        runs = []
+        for axis, texts in enumerate(self.runs.texts):
+            for start, letters in texts.items():
+                if len(letters) > 1 and not self.trie.contains(letters):
+                    z, rest = divmod(start, self.length ** 2)
+                    y, x = divmod(rest, self.length)
+                    runs.append((letters, (x, y, z, tuple(int(axis == i) for i in range(3)))))
+        return runs
+
     def remove(self, word):
         length = word.length
         x_sign = word.x_sign
@@ -375,42 +691,169 @@ class Cube:
             y = y_pos + i * y_sign
             z = z_pos + i * z_sign
 
-            if self.cube_count[z][y][x] == 1:
-                self.cube[z][y][x] = self.empty_space
+            if self.cube.get_count(x, y, z) == 1:
+                self.cube.set_letter(x, y, z, self.empty_space)
+                self.runs.discard(self.get_cell(x, y, z))
             
         if word.index in self.inserted_indexes:
-            self.inserted_indexes.remove(word.index)
+            self.remove_inserted_index(word.index)
+            self.remove_letter_cells(word)
+            self.remove_trail_entry(word.index)
+            self.hash ^= self.get_word_key(word)
         self.decrement_cube_count(word)
         word.clear_position()
 
+    def remove_trail_entry(self, index):
+        for i in range(len(self.trail) - 1, -1, -1):
+            if self.trail[i] == index:
+                del self.trail[i]
+                return
+
     def is_valid_position(self, x, y, z):
         return 0 <= x < self.length and 0 <= y < self.length and 0 <= z < self.length
 
+    def get_layout(self):
+        return [(index,) + self.get_placement(self.words[index]) for index in self.trail]
+
+    def get_placement(self, word):
+        return (word.x, word.y, word.z, word.get_orientation())
+
+    def record_best_layout(self):
+        if len(self.trail) > len(self.best_layout):
+            self.best_layout = self.get_layout()
+            if self.layout_sink is not None:
+                self.layout_sink(self)
+
+    def grow(self, scale_factor):
+        """Pads the board to the length of scale_factor around the best layout so far.
+
+        The layout is kept centred and placed again, so the search carries on
+        from it. Failed boards are forgotten, since more room can complete them.
+        """
+        length = math.floor(self.pivot_word_length * scale_factor)
+        if length < self.length:
+            raise ValueError('A board can only grow.')
+        offset = (length - self.length) // 2
+        layout = [(entry[0], entry[1] + offset, entry[2] + offset, entry[3] + offset, entry[4]) for entry in self.best_layout or self.get_layout()]
+
+        self.reset()
+        self.length = length
+        self.cube = self.init_cube()
+        self.runs = RunIndex(length, 3)
+        for word in self.words.values():
+            word.set_board_length(length)
+        self.max_length = length - self.pivot_word_length
+        self.select_pivots(self.pivot_start, self.pivot_step)
+        self.pivot_index = 0
+        self.zobrist = ZobristKeys()
+        self.failed_states.clear()
+        self.best_layout = []
+        self.load_layout(layout)
+        self.best_layout = layout
+
+    def load_layout(self, layout):
+        self.reset()
+        for entry in layout:
+            word = self.words[entry[0]]
+            self.set_placement(word, entry[1:])
+            self.place(word)
+        return self.words.values()
+
+    def is_expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def is_stopped(self):
+        return self.is_expired() or self.stop_event is not None and self.stop_event.is_set()
+
+    def restore_best_layout(self):
+        """Puts the best layout found so far back on the board, e.g. after a deadline.
+
+        The latest words are taken off until every run of letters is a word,
+        so the board shows no part of a missing word.
+        """
+        self.record_best_layout()
+        self.load_layout(self.best_layout)
+        self.drop_open_runs()
+
+    def drop_open_runs(self):
+        """Takes words off the board until every run of letters is a word.
+
+        The latest word with a letter in an open run goes first, along with
+        the words it leaves without crossings back to the first word.
+        """
+        layout = self.get_layout()
+        runs = self.get_open_runs()
+        while runs:
+            open_cells = set()
+            for letters, placement in runs:
+                open_cells.update(self.get_cells(*placement, len(letters)))
+            layout.pop(max(k for k, entry in enumerate(layout)
+                           if open_cells & self.get_cells(*entry[1:], self.words[entry[0]].length)))
+            layout = self.get_connected_layout(layout)
+            self.load_layout(layout)
+            runs = self.get_open_runs()
+
+    def get_connected_layout(self, layout):
+        # The entries joined to the first one through crossings, in layout order.
+        cells = [self.get_cells(*entry[1:], self.words[entry[0]].length) for entry in layout]
+        connected = {0} if layout else set()
+        stack = list(connected)
+        while stack:
+            k = stack.pop()
+            for j in range(len(layout)):
+                if j not in connected and cells[k] & cells[j]:
+                    connected.add(j)
+                    stack.append(j)
+        return [entry for k, entry in enumerate(layout) if k in connected]
+
+    def get_unplaced_words(self):
+        return [self.word_list[i] for i in sorted(self.get_remaining_indexes())]
+
     def generate(self):
-        inserted_indexes = deque(maxlen=self.num_words)
+        # Backtracking undoes the latest entry of the trail, so words already on
+        # the board, e.g. after grow(), and words placed as intersections are
+        # taken off like any other.
         max_inserted = 0
         max_index = 0
-        while self.pivot_index < self.num_pivots:
-            remaining_indexes = self.get_remaining_indexes()
-            insertions = False            
+        while self.pivot_index < self.num_pivots or self.inserted_indexes:
+            if self.is_stopped():
+                if self.is_expired():
+                    self.restore_best_layout()
+                return None
+            remaining_indexes = self.get_word_order()
+            insertions = False
+            # Cleared by insert() when a placement tried before is still open.
+            self.dead_end = True
 
             for i in remaining_indexes:
-                if self.insert(self.words[i]):
-                    insertions = True
-                    inserted_indexes.append(i)
+                if i in self.inserted_indexes:
+                    # Already placed as an intersection of an earlier word.
+                    continue
+                checkpoint = self.checkpoint()
+                # A placement landing on a failed board is undone and the next one tried.
+                while self.insert(self.words[i]):
+                    if self.hash not in self.failed_states:
+                        insertions = True
+                        break
+                    self.rollback(checkpoint)
                 
             num_inserted = len(self.inserted_indexes)
             if num_inserted == self.num_words:
                 return self.words.values()
             if not insertions:
+                # Every placement left leads to a failed board.
+                if self.dead_end:
+                    self.failed_states.add(self.hash)
                 if num_inserted > max_inserted:
+                    self.record_best_layout()
                     max_inserted = num_inserted
                     max_index = self.pivot_index
                 
-                if num_inserted == 1 or self.depth > self.max_depth:
+                if num_inserted == 1 or self.depth > self.get_depth_limit():
                     print(f'({self.pivot_index}/{self.num_pivots})Max Insertions: {max_inserted}/{self.num_words} @Pivot: {max_index}')
-                    inserted_indexes = deque(maxlen=self.num_words)
+                    self.num_restarts += 1
                     self.reset()
                 else:
-                    self.remove(self.words[inserted_indexes.pop()])
+                    if self.trail:
+                        self.rollback(len(self.trail) - 1)
                     self.depth += 1
\ No newline at end of file
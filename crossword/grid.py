@@ -1,150 +1,332 @@
+from crossword.crossing import CrossingTable, order_words, rank_words
+from crossword.restarts import RESTART_SCHEDULES, get_pivot_permutation
+from crossword.runs import RunIndex
+from crossword.transposition import TranspositionTable, ZobristKeys
+from crossword.trie import WordTrie
 from crossword.word import Word2D
 import math
-from collections import deque
+import random
+import time
+from array import array
+from itertools import islice
+
+
+class DictGrid:
+
+    """Nested dict board storage indexed as letters[y][x]."""
+
+    def __init__(self, length, empty_space, alphabet=''):
+        self.length = length
+        self.empty_space = empty_space
+        self.letters = self.init_rows(empty_space)
+        self.counts = self.init_rows(0)
+
+    def init_rows(self, value):
+        grid = {}
+        for j in range(self.length):
+            row = {}
+            for i in range(self.length):
+                row[i] = value
+            grid[j] = row
+        return grid
+
+    def __getitem__(self, y):
+        return self.letters[y]
+
+    def get_letter(self, x, y):
+        return self.letters[y][x]
+
+    def set_letter(self, x, y, letter):
+        self.letters[y][x] = letter
+
+    def get_count(self, x, y):
+        return self.counts[y][x]
+
+    def increment_count(self, x, y):
+        self.counts[y][x] += 1
+
+    def decrement_count(self, x, y):
+        if self.counts[y][x] > 0:
+            self.counts[y][x] -= 1
+
+
+class FlatGrid:
+
+    """Contiguous board storage indexed as y*length + x.
+
+    Letters are stored as uint8 codes into `alphabet` (code 0 is the empty
+    space) and counts as unsigned shorts.
+    """
+
+    def __init__(self, length, empty_space, alphabet=''):
+        self.length = length
+        self.empty_space = empty_space
+        self.alphabet = [empty_space] + sorted(set(alphabet) - {empty_space})
+        if len(self.alphabet) > 256:
+            raise ValueError('Flat storage supports at most 255 distinct letters.')
+        self.codes = {letter: code for code, letter in enumerate(self.alphabet)}
+        size = length * length
+        self.letters = bytearray(size)
+        self.counts = array('H', bytes(2 * size))
+
+    def __getitem__(self, y):
+        start = y * self.length
+        return [self.alphabet[code] for code in self.letters[start:start + self.length]]
+
+    def get_letter(self, x, y):
+        return self.alphabet[self.letters[y * self.length + x]]
+
+    def set_letter(self, x, y, letter):
+        self.letters[y * self.length + x] = self.codes[letter]
+
+    def get_count(self, x, y):
+        return self.counts[y * self.length + x]
+
+    def increment_count(self, x, y):
+        self.counts[y * self.length + x] += 1
+
+    def decrement_count(self, x, y):
+        i = y * self.length + x
+        if self.counts[i] > 0:
+            self.counts[i] -= 1
+
+
+GRID_STORAGE = {'dict': DictGrid, 'flat': FlatGrid}
+
+
+def get_centered_index(i, count):
+    # Walks 0..count-1 outwards from the middle: mid, mid-1, mid+1, ...
+    middle = count // 2
+    if i % 2:
+        return middle - (i + 1) // 2
+    return middle + i // 2
 
 
 class Grid:
 
-    def __init__(self, words, scale_factor, empty_space='-', max_depth=10):
-        self.word_list = sorted(words, key=len, reverse=True)
+    dimension = 2
+
+    def __init__(self, words, scale_factor, empty_space='-', max_depth=10, storage='dict', ordering='length', table_size=65536,
+                 seed=None, restarts='luby', deadline=None, time_budget=None):
+        if storage not in GRID_STORAGE:
+            raise ValueError(f'Unknown grid storage: {storage}')
+        self.word_list = order_words(words, ordering)
+        self.word_ranks = rank_words(self.word_list, ordering)
         self.empty_space = empty_space
         self.num_words = len(words)
+        self.pivot_word_length = len(self.word_list[0])
+        self.length = math.floor(self.pivot_word_length * scale_factor)
         self.words = self.init_words()
         self.pivot_word = self.words[0]
-        self.pivot_word_length = self.pivot_word.length
-        self.length = math.floor(self.pivot_word_length * scale_factor)
-        self.grid = self.init_grid(empty_space)
-        self.grid_count = self.init_grid(0)
+        self.storage = storage
+        self.grid = self.init_grid()
+        self.runs = RunIndex(self.length, 2)
+        if restarts not in RESTART_SCHEDULES:
+            raise ValueError(f'Unknown restart schedule: {restarts}')
+        # Without a seed the search stays deterministic and resets after max_depth.
+        self.random = random.Random(seed) if seed is not None else None
+        self.restart_schedule = RESTART_SCHEDULES[restarts]
+        self.num_restarts = 0
         self.max_length = self.length - self.pivot_word_length
+        self.pivot_start = 0
+        self.pivot_step = 1
         self.pivot_positions = self.get_pivot_positions()
-        self.num_pivots = len(self.pivot_positions) - 1
+        self.num_pivots = self.count_pivot_positions()
         self.pivot_index = 0
         self.depth = 0
         self.max_depth = max_depth
         self.indexes = set(range(self.num_words))
         self.inserted_indexes = set()
+        self.trie = WordTrie(self.word_list)
+        self.crossings = CrossingTable(self.word_list)
+        self.letter_cells = {}
+        self.trail = []
+        self.zobrist = ZobristKeys()
+        self.hash = 0
+        self.failed_states = TranspositionTable(table_size)
+        self.dead_end = False
+        self.stop_event = None
+        # A time.monotonic() value; time_budget counts from construction.
+        if time_budget is not None:
+            budget_deadline = time.monotonic() + time_budget
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        self.deadline = deadline
+        self.best_layout = []
+        self.layout_sink = None
 
     def get_remaining_indexes(self):
         return self.indexes - self.inserted_indexes
-    
-    def get_pivot_positions(self, centered=True):
-        if self.length == self.pivot_word_length:
-            return [y*self.length for y in range(self.length)]
-        
-        coordinates = [(x, y) for x in range(self.max_length) for y in range(self.length)]
-        positions = [y * self.length + x for (x, y) in coordinates]
 
-        if not centered:
-            return positions
-        
-        centered_positions = []
-        
-        for (p1,p2) in zip(positions[:len(positions)//2][::-1], positions[len(positions)//2:]):
-            centered_positions.append(p1)
-            centered_positions.append(p2)
+    def add_inserted_index(self, index):
+        self.inserted_indexes.add(index)
+        self.trie.mark_placed(index)
+
+    def remove_inserted_index(self, index):
+        self.inserted_indexes.remove(index)
+        self.trie.mark_unplaced(index)
+    
+    def count_pivot_positions(self):
+        # The pivot is always horizontal: a vertical pivot is the same layout
+        # transposed, and reflections would reverse the words.
+        return max(self.max_length + 1, 0) * self.length
+
+    def select_pivots(self, start, step):
+        # Restricts the search to every step-th pivot, e.g. one share per worker.
+        self.pivot_start = start
+        self.pivot_step = step
+        self.pivot_positions = self.get_pivot_positions()
+        self.num_pivots = len(range(start, self.count_pivot_positions(), step))
 
-        return centered_positions
+    def get_pivot_positions(self, centered=True):
+        return islice(self.iter_pivot_positions(centered), self.pivot_start, None, self.pivot_step)
+
+    def iter_pivot_positions(self, centered=True):
+        num_positions = self.count_pivot_positions()
+        if self.random is not None:
+            permutation = get_pivot_permutation(self.random, num_positions)
+        for i in range(num_positions):
+            if self.random is not None:
+                i = permutation(i)
+            elif centered:
+                i = get_centered_index(i, num_positions)
+            x, y = divmod(i, self.length)
+            yield (x, y)
 
     def init_words(self, words=[]):
         word_list = self.word_list if not words else words
         word_objects = {}
         for i, word in enumerate(word_list):
-            word_obj = Word2D(word, i)
+            word_obj = Word2D(word, i, board_length=self.length)
             if (i + 1) % 2 == 0:
                 word_obj.rotate()
             word_objects[i] = word_obj
+        self.initial_orientations = [word.get_orientation() for word in word_objects.values()]
         return word_objects
           
-    def init_grid(self, value):
-        grid = {}
-        for j in range(self.length):
-            row = {}
-            for i in range(self.length):
-                row[i] = value
-            grid[j] = row
-        return grid
+    def init_grid(self):
+        return GRID_STORAGE[self.storage](self.length, self.empty_space, ''.join(self.word_list))
     
     def update_grid(self, word):
         for i in range(word.length):
-            self.grid[word.y + i * word.y_sign][word.x + i * word.x_sign] = word.value[i]
+            x = word.x + i * word.x_sign
+            y = word.y + i * word.y_sign
+            if self.grid.get_letter(x, y) == self.empty_space:
+                self.runs.add(self.get_cell(x, y), word.value[i])
+            self.grid.set_letter(x, y, word.value[i])
+        self.add_letter_cells(word)
+
+    def add_letter_cells(self, word):
+        orientation = word.get_orientation()
+        for i, letter in enumerate(word.value):
+            cells = self.letter_cells.setdefault(letter, {})
+            cell = (word.x + i * word.x_sign, word.y + i * word.y_sign, orientation)
+            cells[cell] = cells.get(cell, 0) + 1
+
+    def remove_letter_cells(self, word):
+        orientation = word.get_orientation()
+        for i, letter in enumerate(word.value):
+            cells = self.letter_cells[letter]
+            cell = (word.x + i * word.x_sign, word.y + i * word.y_sign, orientation)
+            if cells[cell] > 1:
+                cells[cell] -= 1
+            else:
+                del cells[cell]
+
+    def place(self, word):
+        self.increment_grid_count(word)
+        self.update_grid(word)
+        self.add_inserted_index(word.index)
+        self.trail.append(word.index)
+        self.hash ^= self.get_word_key(word)
+
+    def get_word_key(self, word):
+        return self.zobrist.get_key(word.index, word.generate_insertion_entry())
+
+    def get_depth_limit(self):
+        if self.random is None:
+            return self.max_depth
+        return self.max_depth * self.restart_schedule(self.num_restarts + 1)
+
+    def get_word_order(self):
+        # A seed only shuffles the remaining words whose ordering keys tie.
+        indexes = self.get_remaining_indexes()
+        if self.random is None:
+            return indexes
+        return sorted(indexes, key=lambda i: (self.word_ranks[i], self.random.random()))
+
+    def get_search_order(self, items):
+        items = list(items)
+        if self.random is not None:
+            self.random.shuffle(items)
+        return items
+
+    def get_anchor_offsets(self, word):
+        offsets = self.crossings.offsets[word.index]
+        if self.random is None:
+            return offsets
+        # Keep the rarest letters first but break ties at random.
+        counts = self.crossings.offset_counts[word.index]
+        return sorted(offsets, key=lambda k: (counts[k], self.random.random()))
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def rollback(self, checkpoint=0):
+        while len(self.trail) > checkpoint:
+            self.remove(self.words[self.trail[-1]])
 
     def reset(self):
         self.depth = 0
-        self.words = self.init_words()
-        self.inserted_indexes = set()
-        self.grid_count = self.init_grid(0)
-        self.grid = self.init_grid(self.empty_space)
+        self.rollback()
+        for word in self.words.values():
+            word.clear_insertion_history()
+            while word.get_orientation() != self.initial_orientations[word.index]:
+                word.rotate()
 
     def increment_grid_count(self, word):
         for i in range(word.length):
             x = word.x + i * word.x_sign
             y = word.y + i * word.y_sign
-            self.grid_count[y][x] += 1
+            self.grid.increment_count(x, y)
 
     def decrement_grid_count(self, word):
         for i in range(word.length):
             x = word.x + i * word.x_sign
             y = word.y + i * word.y_sign
-            if self.grid_count[y][x] > 0:
-                self.grid_count[y][x] -= 1
+            self.grid.decrement_count(x, y)
 
     def print_grid(self):
         print('--- Start Grid ---')
         for j in range(self.length):
-            row = ''
-            for i in range(self.length):
-                row += self.grid[j][i]
-            print(row)
+            print(''.join(self.grid.get_letter(i, j) for i in range(self.length)))
         print('--- End Grid --- ')
 
-    def check_word_ends(self, word):
-        x_sign, y_sign = word.x_sign, word.y_sign
-        max_len = self.length - 1
+    def get_cell(self, x, y):
+        return y*self.length + x
 
-        x_prev = word.x - x_sign
-        y_prev = word.y - y_sign
-        x_next = word.x + x_sign*word.length
-        y_next = word.y + y_sign*word.length
+    def check_word_ends(self, word):
+        x_prev = word.x - word.x_sign
+        y_prev = word.y - word.y_sign
+        x_next = word.x + word.x_sign*word.length
+        y_next = word.y + word.y_sign*word.length
 
-        first_letter = word.value[0]
-        last_letter = word.value[-1]
-        prev_letter = self.grid[max(y_prev, 0)][max(x_prev, 0)]
-        next_letter = self.grid[min(y_next, max_len)][min(x_next, max_len)]
+        # Any occupied cell blocks a word from ending next to it.
+        if self.is_valid_position(x_prev, y_prev) and self.runs.is_occupied(self.get_cell(x_prev, y_prev)):
+            return False
 
-        if x_prev < 0 and y_prev < 0:
-            if prev_letter != first_letter and prev_letter != self.empty_space:
-                return False
-        
-        if x_prev >= 0 and y_prev >= 0:
-            if prev_letter != self.empty_space:
-                return False
-        
-        if x_next > max_len and y_next > max_len:
-            if next_letter != last_letter and next_letter != self.empty_space:
-                return False
-        
-        if x_next <= max_len and y_next <= max_len:
-            if next_letter != self.empty_space:
-                return False
+        if self.is_valid_position(x_next, y_next) and self.runs.is_occupied(self.get_cell(x_next, y_next)):
+            return False
         return True
 
     def get_intersections(self, x_test, y_test, test_orientation, direction):
-        u_sign, v_sign = test_orientation
-        starting_coordinattes = None
-        letters = ''
-
-        if self.is_valid_position(x_test, y_test):
-            min_space = self.grid[y_test][x_test]
-            if min_space != self.empty_space:
-                xk = x_test
-                yk = y_test
-                while self.is_valid_position(xk, yk) and self.grid[yk][xk] != self.empty_space:
-                    if not starting_coordinattes and direction != 1:
-                        starting_coordinattes = (xk, yk)
-                    letters += self.grid[yk][xk]
-                    xk += direction*u_sign
-                    yk += direction*v_sign
-        return letters[::direction], starting_coordinattes
+        if not self.is_valid_position(x_test, y_test):
+            return '', None
+
+        axis = test_orientation.index(1)
+        letters = self.runs.get_letters(self.get_cell(x_test, y_test), axis, direction)
+        if letters and direction != 1:
+            return letters, (x_test, y_test)
+        return letters, None
 
     def check_insertion(self, word, offset, recursive=True):
         x_sign = word.x_sign
@@ -185,7 +367,7 @@ class Grid:
 
             word_letter = word.value[i]
             letters = letters_min + word_letter + letters_max
-            inline_space = self.grid[y + i*y_sign][x + i*x_sign]
+            inline_space = self.grid.get_letter(x + i*x_sign, y + i*y_sign)
 
             if inline_space not in (word_letter, self.empty_space):
                 return False
@@ -193,14 +375,8 @@ class Grid:
             len_letters = len(letters)
 
             if len_letters > 1:
-                matching_words = []
-                for i in self.get_remaining_indexes():
-                    remaining_word = self.words[i]
-                    if remaining_word.value[:len_letters] == letters and i != word.index:
-                        matching_words.append(remaining_word)
-
-            if len_letters > 1 and not matching_words:
-                if letters not in self.word_list:
+                matching_words = [self.words[j] for j in self.trie.find_remaining(letters, word.index)]
+                if not matching_words and not self.trie.contains(letters):
                     return False
             
             if coordinates:
@@ -219,14 +395,19 @@ class Grid:
         return True
 
     def insert_pivot(self, pivot_word):
+        pivot_position = next(self.pivot_positions, None)
+        if pivot_position is None:
+            return False
+        self.pivot_index += 1
+        return self.place_pivot(pivot_word, pivot_position)
+
+    def place_pivot(self, pivot_word, pivot_position):
         if not pivot_word.x_sign:
             pivot_word.rotate()
 
-        pivot_position = self.pivot_positions[self.pivot_index]
         pivot_length = pivot_word.length - 1
 
-        x = pivot_position % max(self.max_length, 1)
-        y = pivot_position // self.length
+        x, y = pivot_position
 
         x_max = x + pivot_length*pivot_word.x_sign
         y_max = y + pivot_length*pivot_word.y_sign
@@ -234,11 +415,8 @@ class Grid:
         if not self.is_valid_position(x_max, y_max):
             return False
         
-        self.pivot_index += 1
         pivot_word.update_position(x, y)
-        self.update_grid(pivot_word)
-        self.increment_grid_count(pivot_word)
-        self.inserted_indexes.add(pivot_word.index)
+        self.place(pivot_word)
         return True
 
     def insert_at(self, word, x, y, orientation):
@@ -253,12 +431,10 @@ class Grid:
         
         insertion_entry = word.generate_insertion_entry()
 
-        if insertion_entry not in word.insertion_history and \
+        if not word.has_insertion_entry(insertion_entry) and \
             self.check_insertion(word, offset, recursive=False):
-                self.increment_grid_count(word)
                 word.add_insertion_entry(insertion_entry)
-                self.update_grid(word)
-                self.inserted_indexes.add(word.index)
+                self.place(word)
                 return True
         return False
 
@@ -266,34 +442,107 @@ class Grid:
         if not self.inserted_indexes:
             return self.insert_pivot(word)
 
-        for i in self.inserted_indexes:
-            inserted_word = self.words[i]
-            for j in range(inserted_word.length):
-                for k in range(word.length):
-                    if word.value[k] == inserted_word.value[j]:
-                        if word.get_orientation() == inserted_word.get_orientation():
-                            word.rotate()
-                        x = inserted_word.x + j * inserted_word.x_sign
-                        y = inserted_word.y + j * inserted_word.y_sign
-                        x_start = x - k * word.x_sign
-                        y_start = y - k * word.y_sign
-                        x_end = x_start + (word.length - 1) * word.x_sign
-                        y_end = y_start + (word.length - 1) * word.y_sign
-
-                        if self.is_valid_position(x_start, y_start) and \
-                            self.is_valid_position(x_end, y_end):
-                            word.update_position(x_start, y_start)
-                            offset = k
-                            insertion_entry = word.generate_insertion_entry()
-                            if insertion_entry not in word.insertion_history and \
-                                self.check_insertion(word, offset):
-                                    self.increment_grid_count(word)
-                                    word.add_insertion_entry(insertion_entry)
-                                    self.update_grid(word)
-                                    self.inserted_indexes.add(word.index)
-                                    return True
+        for k in self.get_anchor_offsets(word):
+            for (x, y, orientation) in self.get_search_order(self.letter_cells.get(word.value[k], ())):
+                if word.get_orientation() == orientation:
+                    word.rotate()
+                x_start = x - k * word.x_sign
+                y_start = y - k * word.y_sign
+                x_end = x_start + (word.length - 1) * word.x_sign
+                y_end = y_start + (word.length - 1) * word.y_sign
+
+                if self.is_valid_position(x_start, y_start) and \
+                    self.is_valid_position(x_end, y_end):
+                    word.update_position(x_start, y_start)
+                    offset = k
+                    insertion_entry = word.generate_insertion_entry()
+                    if not word.has_insertion_entry(insertion_entry):
+                        if self.check_insertion(word, offset):
+                            word.add_insertion_entry(insertion_entry)
+                            self.place(word)
+                            return True
+                    elif self.dead_end and self.hash ^ self.get_word_key(word) not in self.failed_states and \
+                        self.check_insertion(word, offset, recursive=False):
+                        # A placement tried before still leads to a board not known to fail.
+                        self.dead_end = False
         return False
     
+    def get_anchors(self, word, crossed_word=None):
+        if crossed_word is None:
+            return [(k, cell) for k in self.crossings.offsets[word.index]
+                    for cell in self.letter_cells.get(word.value[k], ())]
+
+        orientation = crossed_word.get_orientation()
+        return [(k, (crossed_word.x + j * crossed_word.x_sign, crossed_word.y + j * crossed_word.y_sign, orientation))
+                for (k, j) in self.crossings.get_pairs(word.index, crossed_word.index)]
+
+    def get_placements(self, word, crossed_word=None):
+        placements = []
+        seen = set()
+        for k, (x, y, (x_sign, y_sign)) in self.get_anchors(word, crossed_word):
+            orientation = (y_sign, x_sign) # Perpendicular to the crossed word
+            x_start = x - k * orientation[0]
+            y_start = y - k * orientation[1]
+            if (x_start, y_start, orientation) in seen or not self.is_valid_position(x_start, y_start):
+                continue
+            seen.add((x_start, y_start, orientation))
+
+            self.set_placement(word, (x_start, y_start, orientation))
+            if self.check_insertion(word, k, recursive=False):
+                placements.append((x_start, y_start, orientation))
+        word.clear_position()
+        return placements
+
+    def filter_placements(self, word, placements, cells):
+        # Only placements on a line through one of the new cells can change.
+        kept = []
+        for placement in placements:
+            axis = placement[2][1]
+            start = placement[axis]
+            end = start + word.length
+            if any(start - 1 <= cell[axis] <= end for cell in cells):
+                self.set_placement(word, placement)
+                if not self.check_insertion(word, -1, recursive=False):
+                    continue
+            kept.append(placement)
+        word.clear_position()
+        return kept
+
+    def set_placement(self, word, placement):
+        x, y, orientation = placement
+        word.update_position(x, y)
+        if word.get_orientation() != orientation:
+            word.rotate()
+
+    def insert_placement(self, word, placement):
+        self.set_placement(word, placement)
+        cells = [(word.x + i * word.x_sign, word.y + i * word.y_sign) for i in range(word.length)]
+        new_cells = [(x, y) for (x, y) in cells if not self.runs.is_occupied(self.get_cell(x, y))]
+        self.place(word)
+        return new_cells
+
+    def check_runs(self):
+        # Every run of letters must be a word or the start of a remaining one.
+        for texts in self.runs.texts:
+            for letters in texts.values():
+                if len(letters) > 1 and not self.trie.contains(letters) and not self.trie.find_remaining(letters):
+                    return False
+        return True
+
+    def get_cells(self, x, y, orientation, length):
+        x_sign, y_sign = orientation
+        return {(x + i * x_sign, y + i * y_sign) for i in range(length)}
+
+    def get_open_runs(self):
+        # Runs of letters that are not words yet, each with the placement that would complete it.
+        runs = []
+        for axis, texts in enumerate(self.runs.texts):
+            for start, letters in texts.items():
+                if len(letters) > 1 and not self.trie.contains(letters):
+                    y, x = divmod(start, self.length)
+                    runs.append((letters, (x, y, (int(axis == 0), int(axis == 1)))))
+        return runs
+
     def remove(self, word):
         length = word.length
         x_sign = word.x_sign
@@ -305,41 +554,168 @@ class Grid:
             x = x_pos + i * x_sign
             y = y_pos + i * y_sign
 
-            if self.grid_count[y][x] == 1:
-                self.grid[y][x] = self.empty_space
+            if self.grid.get_count(x, y) == 1:
+                self.grid.set_letter(x, y, self.empty_space)
+                self.runs.discard(self.get_cell(x, y))
         
-        self.inserted_indexes.remove(word.index)
+        self.remove_inserted_index(word.index)
+        self.remove_letter_cells(word)
         self.decrement_grid_count(word)
+        self.remove_trail_entry(word.index)
+        self.hash ^= self.get_word_key(word)
         word.clear_position()
 
+    def remove_trail_entry(self, index):
+        for i in range(len(self.trail) - 1, -1, -1):
+            if self.trail[i] == index:
+                del self.trail[i]
+                return
+
     def is_valid_position(self, x, y):
         return 0 <= x < self.length and 0 <= y < self.length
 
+    def get_layout(self):
+        return [(index,) + self.get_placement(self.words[index]) for index in self.trail]
+
+    def get_placement(self, word):
+        return (word.x, word.y, word.get_orientation())
+
+    def record_best_layout(self):
+        if len(self.trail) > len(self.best_layout):
+            self.best_layout = self.get_layout()
+            if self.layout_sink is not None:
+                self.layout_sink(self)
+
+    def grow(self, scale_factor):
+        """Pads the board to the length of scale_factor around the best layout so far.
+
+        The layout is kept centred and placed again, so the search carries on
+        from it. Failed boards are forgotten, since more room can complete them.
+        """
+        length = math.floor(self.pivot_word_length * scale_factor)
+        if length < self.length:
+            raise ValueError('A board can only grow.')
+        offset = (length - self.length) // 2
+        layout = [(entry[0], entry[1] + offset, entry[2] + offset, entry[3]) for entry in self.best_layout or self.get_layout()]
+
+        self.reset()
+        self.length = length
+        self.grid = self.init_grid()
+        self.runs = RunIndex(length, 2)
+        for word in self.words.values():
+            word.set_board_length(length)
+        self.max_length = length - self.pivot_word_length
+        self.select_pivots(self.pivot_start, self.pivot_step)
+        self.pivot_index = 0
+        self.zobrist = ZobristKeys()
+        self.failed_states.clear()
+        self.best_layout = []
+        self.load_layout(layout)
+        self.best_layout = layout
+
+    def load_layout(self, layout):
+        self.reset()
+        for entry in layout:
+            word = self.words[entry[0]]
+            self.set_placement(word, entry[1:])
+            self.place(word)
+        return self.words.values()
+
+    def is_expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def is_stopped(self):
+        return self.is_expired() or self.stop_event is not None and self.stop_event.is_set()
+
+    def restore_best_layout(self):
+        """Puts the best layout found so far back on the board, e.g. after a deadline.
+
+        The latest words are taken off until every run of letters is a word,
+        so the board shows no part of a missing word.
+        """
+        self.record_best_layout()
+        self.load_layout(self.best_layout)
+        self.drop_open_runs()
+
+    def drop_open_runs(self):
+        """Takes words off the board until every run of letters is a word.
+
+        The latest word with a letter in an open run goes first, along with
+        the words it leaves without crossings back to the first word.
+        """
+        layout = self.get_layout()
+        runs = self.get_open_runs()
+        while runs:
+            open_cells = set()
+            for letters, placement in runs:
+                open_cells.update(self.get_cells(*placement, len(letters)))
+            layout.pop(max(k for k, entry in enumerate(layout)
+                           if open_cells & self.get_cells(*entry[1:], self.words[entry[0]].length)))
+            layout = self.get_connected_layout(layout)
+            self.load_layout(layout)
+            runs = self.get_open_runs()
+
+    def get_connected_layout(self, layout):
+        # The entries joined to the first one through crossings, in layout order.
+        cells = [self.get_cells(*entry[1:], self.words[entry[0]].length) for entry in layout]
+        connected = {0} if layout else set()
+        stack = list(connected)
+        while stack:
+            k = stack.pop()
+            for j in range(len(layout)):
+                if j not in connected and cells[k] & cells[j]:
+                    connected.add(j)
+                    stack.append(j)
+        return [entry for k, entry in enumerate(layout) if k in connected]
+
+    def get_unplaced_words(self):
+        return [self.word_list[i] for i in sorted(self.get_remaining_indexes())]
+
     def generate(self):
-        inserted_indexes = deque(maxlen=self.num_words)
+        # Backtracking undoes the latest entry of the trail, so words already on
+        # the board, e.g. after grow(), and words placed as intersections are
+        # taken off like any other.
         max_inserted = 0
         max_index = 0
-        while self.pivot_index < self.num_pivots:
-            remaining_indexes = self.get_remaining_indexes()
-            insertions = False            
+        while self.pivot_index < self.num_pivots or self.inserted_indexes:
+            if self.is_stopped():
+                if self.is_expired():
+                    self.restore_best_layout()
+                return None
+            remaining_indexes = self.get_word_order()
+            insertions = False
+            # Cleared by insert() when a placement tried before is still open.
+            self.dead_end = True
 
             for i in remaining_indexes:
-                if self.insert(self.words[i]):
-                    insertions = True
-                    inserted_indexes.append(i)
+                if i in self.inserted_indexes:
+                    # Already placed as an intersection of an earlier word.
+                    continue
+                checkpoint = self.checkpoint()
+                # A placement landing on a failed board is undone and the next one tried.
+                while self.insert(self.words[i]):
+                    if self.hash not in self.failed_states:
+                        insertions = True
+                        break
+                    self.rollback(checkpoint)
                 
             num_inserted = len(self.inserted_indexes)
             if num_inserted == self.num_words:
                 return self.words.values()
             if not insertions:
+                # Every placement left leads to a failed board.
+                if self.dead_end:
+                    self.failed_states.add(self.hash)
                 if num_inserted > max_inserted:
+                    self.record_best_layout()
                     max_inserted = num_inserted
                     max_index = self.pivot_index
-                self.remove(self.words[inserted_indexes.pop()])
+                if self.trail:
+                    self.rollback(len(self.trail) - 1)
                 self.depth += 1
-                if num_inserted == 1 or self.depth > self.max_depth:
+                if num_inserted == 1 or self.depth > self.get_depth_limit():
                     print(f'({self.pivot_index}/{self.num_pivots})Max Insertions: {max_inserted}/{self.num_words} @Pivot: {max_index}')
-                    inserted_indexes = deque(maxlen=self.num_words)
+                    self.num_restarts += 1
                     self.reset()
                 
                          
@@ -0,0 +1,91 @@
+DIRECTIONS = ('across', 'down', 'vertical')
+
+
+class PlacedWord:
+
+    """A word of a Layout with its position, clue and clue number."""
+
+    __slots__ = ('value', 'clue', 'x', 'y', 'z', 'x_sign', 'y_sign', 'z_sign', 'number')
+
+    def __init__(self, value, clue, x, y, z, direction):
+        self.value = value
+        self.clue = clue
+        self.x = x
+        self.y = y
+        self.z = z
+        self.x_sign, self.y_sign, self.z_sign = (int(direction == d) for d in DIRECTIONS)
+        self.number = None
+
+    def get_direction(self):
+        return DIRECTIONS[(self.x_sign, self.y_sign, self.z_sign).index(1)]
+
+    def get_cells(self):
+        return [(self.x + i * self.x_sign, self.y + i * self.y_sign, self.z + i * self.z_sign)
+                for i in range(len(self.value))]
+
+
+class Layout:
+
+    """A solved Grid or Cube detached from the search, ready to render.
+
+    Words are kept in placement order and numbered in reading order, words
+    starting on the same cell sharing a number. A partial layout, found
+    when a time budget ran out, lists its missing words in `unplaced`.
+    """
+
+    def __init__(self, dimension, length, words, scale_factor=None, unplaced=()):
+        self.dimension = dimension
+        self.length = length
+        self.scale_factor = scale_factor
+        self.words = words
+        self.unplaced = list(unplaced)
+        self.letters = {}
+        for word in self.words:
+            for cell, letter in zip(word.get_cells(), word.value):
+                self.letters[cell] = letter
+        self.number_words()
+
+    def number_words(self):
+        position = lambda word: (word.z, word.y, word.x)
+        number, previous = 0, None
+        for word in sorted(self.words, key=position):
+            if position(word) != previous:
+                number += 1
+                previous = position(word)
+            word.number = number
+
+    def get_letter(self, x, y, z=0):
+        return self.letters.get((x, y, z))
+
+    def to_record(self):
+        """Returns the layout without its clues as JSON-ready data."""
+        return {'dimension': self.dimension, 'length': self.length, 'scale_factor': self.scale_factor,
+                'words': [[word.value, word.x, word.y, word.z, word.get_direction()] for word in self.words]}
+
+    def describe(self):
+        """Lists the words as plain dicts, in placement order."""
+        words = []
+        for word in self.words:
+            placement = {'word': word.value, 'clue': word.clue, 'number': word.number, 'x': word.x, 'y': word.y}
+            if self.dimension == 3:
+                placement['z'] = word.z
+            placement['direction'] = word.get_direction()
+            words.append(placement)
+        return words
+
+
+def create_layout(crossword, clues, scale_factor=None):
+    """Builds the Layout of a Grid, Cube or SharedLayout, taking clues from a word to clue dict."""
+    get_layout = crossword.get_layout if hasattr(crossword, 'get_layout') else crossword.read_layout
+    words = []
+    for entry in get_layout():
+        word = crossword.words[entry[0]]
+        direction = DIRECTIONS[(word.x_sign, word.y_sign, getattr(word, 'z_sign', 0)).index(1)]
+        words.append(PlacedWord(word.value, clues.get(word.value, ''), word.x, word.y, getattr(word, 'z', 0), direction))
+    return Layout(crossword.dimension, crossword.length, words, scale_factor, crossword.get_unplaced_words())
+
+
+def load_layout(record, clues):
+    """Rebuilds a Layout from to_record() data."""
+    words = [PlacedWord(value, clues.get(value, ''), x, y, z, direction) for value, x, y, z, direction in record['words']]
+    return Layout(record['dimension'], record['length'], words, record['scale_factor'])
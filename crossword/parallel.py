@@ -0,0 +1,150 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from crossword.crossing import order_words
+from crossword.shared import SharedLayout
+from crossword.solver import solve
+
+# Seconds between checks of the workers' shared layouts when reporting progress.
+PROGRESS_INTERVAL = 0.5
+
+# Set in each worker process by init_worker.
+stop_flags = None
+
+
+class StopFlag:
+
+    """One task's entry in a shared array of stop flags, polled like an Event."""
+
+    def __init__(self, flags, task):
+        self.flags = flags
+        self.task = task
+
+    def is_set(self):
+        return bool(self.flags[self.task])
+
+
+def init_worker(flags):
+    global stop_flags
+    stop_flags = flags
+
+
+def search_pivots(task, name, engine, words, scale_factor, solver, options, start=0, step=1):
+    crossword = engine(words, scale_factor, **options)
+    crossword.stop_event = StopFlag(stop_flags, task)
+    crossword.select_pivots(start, step)
+    shared = SharedLayout(crossword.word_list, crossword.dimension, crossword.length, name)
+    # Every new best layout is streamed to the parent through the block.
+    crossword.layout_sink = shared.write
+    try:
+        if not solve(crossword, solver):
+            return False
+        shared.write(crossword)
+        return True
+    finally:
+        shared.close()
+
+
+def create_shared_layout(engine, words, scale_factor, options):
+    length = math.floor(max(map(len, words)) * scale_factor)
+    return SharedLayout(order_words(words, options.get('ordering', 'length')), engine.dimension, length)
+
+
+def race(tasks, ordered=False, progress=None):
+    """Runs search_pivots on each argument tuple in its own process.
+
+    Every task writes its layouts to its own SharedLayout block. Returns the
+    task number and block of the first task to find a full layout and stops
+    the others, or (None, None) when every task fails. With ordered set, a
+    layout only stops the tasks after it, and the earliest task to find one
+    wins once every task before it has finished. progress(task, layout) is
+    called whenever a running task publishes a better partial layout.
+    """
+    layouts = [create_shared_layout(task[0], task[1], task[2], task[4]) for task in tasks]
+    sequences = [0] * len(tasks)
+    context = multiprocessing.get_context()
+    flags = context.RawArray('b', len(tasks))
+    winner = None
+    try:
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=context,
+                                 initializer=init_worker, initargs=(flags,)) as executor:
+            futures = {executor.submit(search_pivots, i, layouts[i].name, *task): i for i, task in enumerate(tasks)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL if progress else None,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures[future]
+                    if future.result() and (winner is None or task < winner):
+                        winner = task
+                        for later in range(task + 1, len(tasks)):
+                            flags[later] = 1
+                if winner is not None and (not ordered or all(futures[future] > winner for future in pending)):
+                    break
+                if progress:
+                    for future in pending:
+                        task = futures[future]
+                        sequence = layouts[task].get_sequence()
+                        if sequence != sequences[task] and not sequence % 2:
+                            sequences[task] = sequence
+                            progress(task, layouts[task])
+            for task in range(len(tasks)):
+                flags[task] = 1
+    finally:
+        # The winner's mapping stays valid after its name is unlinked.
+        for task, layout in enumerate(layouts):
+            if task != winner:
+                layout.close()
+            layout.unlink()
+
+    if winner is None:
+        return None, None
+    layouts[winner].load_words()
+    return winner, layouts[winner]
+
+
+def generate_parallel(engine, words, scale_factor, workers=None, solver='greedy', progress=None, **options):
+    """Splits the pivots of a Grid or Cube across worker processes.
+
+    Worker k searches pivots k, k + workers, ... and the first full layout
+    found stops the others. Returns that layout, renderable like the
+    crossword itself, or None.
+    """
+    crossword = engine(words, scale_factor, **options)
+    workers = min(workers or os.cpu_count() or 1, max(crossword.num_pivots, 1))
+    if workers == 1:
+        return crossword if solve(crossword, solver) else None
+
+    _, layout = race([(engine, words, scale_factor, solver, options, k, workers) for k in range(workers)],
+                     progress=progress)
+    return layout
+
+
+def generate_scales(engine, words, scale_factor, workers=None, solver='greedy', step=0.1, progress=None, **options):
+    """Searches several scale factors at once and keeps the smallest board solved.
+
+    Scale factors go up in the autogen steps, skipping those that give the
+    same board length, and a solved board stops the search of every larger
+    one. Batches continue until a board is solved. Returns the layout and
+    its scale factor, or (None, None) once an options['deadline'] passes.
+    """
+    workers = workers or os.cpu_count() or 1
+    pivot_length = max(map(len, words))
+    length = None
+    while True:
+        scale_factors = []
+        while len(scale_factors) < workers:
+            if math.floor(pivot_length * scale_factor) != length:
+                length = math.floor(pivot_length * scale_factor)
+                scale_factors.append(scale_factor)
+            scale_factor += step
+        print(f'Trying scale factors {", ".join(f"{s:.1f}" for s in scale_factors)}')
+
+        winner, layout = race([(engine, words, s, solver, options) for s in scale_factors],
+                              ordered=True, progress=progress)
+        if layout is not None:
+            return layout, scale_factors[winner]
+        if options.get('deadline') is not None and time.monotonic() >= options['deadline']:
+            return None, None
@@ -0,0 +1,48 @@
+import os
+from crossword.parallel import race
+
+# Each configuration overrides the caller's solver and engine options.
+DEFAULT_PORTFOLIO = [
+    {},
+    {'ordering': 'constrained'},
+    {'seed': 1, 'restarts': 'luby'},
+    {'solver': 'backtracking', 'ordering': 'constrained'},
+    {'ordering': 'constrained', 'seed': 2, 'restarts': 'geometric'},
+    {'max_depth': 40},
+    {'solver': 'backtracking', 'seed': 3},
+    {'ordering': 'constrained', 'seed': 4, 'restarts': 'luby', 'max_depth': 20},
+]
+
+
+def describe_configuration(configuration):
+    if not configuration:
+        return 'defaults'
+    return ', '.join(f'{key}={value}' for key, value in configuration.items())
+
+
+def generate_portfolio(engine, words, scale_factor, configurations=None, workers=None, solver='greedy',
+                       progress=None, **options):
+    """Races differently configured searches of the same Grid or Cube.
+
+    Every configuration runs in its own process over all pivots. The first
+    full layout wins and stops the rest. With an options['deadline'], a
+    configuration gives up once it passes and counts as failed. Returns
+    (layout, configuration), or (None, None) when no configuration finds a
+    layout.
+    """
+    configurations = DEFAULT_PORTFOLIO if configurations is None else configurations
+    configurations = configurations[:workers or os.cpu_count() or 1]
+
+    tasks = []
+    for configuration in configurations:
+        task_options = dict(options)
+        task_options.update(configuration)
+        task_solver = task_options.pop('solver', solver)
+        tasks.append((engine, words, scale_factor, task_solver, task_options, 0, 1))
+
+    winner, layout = race(tasks, progress=progress)
+    if layout is None:
+        return None, None
+    configuration = configurations[winner]
+    print(f'Portfolio winner: {describe_configuration(configuration)}')
+    return layout, configuration
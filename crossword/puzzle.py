@@ -1,7 +1,71 @@
 from jinja2 import Environment, FileSystemLoader
+import functools
+import math
 import os
+import time
+from crossword.analysis import FeasibilityAnalysis
+from crossword.cache import get_cache_key
+from crossword.aio import get_default_pool
 from crossword.cube import Cube
 from crossword.grid import Grid
+from crossword.layout import DIRECTIONS, create_layout, load_layout
+from crossword.parallel import generate_parallel, generate_scales
+from crossword.portfolio import generate_portfolio
+from crossword.solver import SOLVERS, solve
+
+# Seconds a search may spend on one board when autogen moves on to larger
+# boards, so a board without a layout cannot hold up the larger ones.
+AUTOGEN_TIME_LIMIT = 10
+
+VARIANTS = ('puzzle', 'solution', 'answers')
+VARIANT_TITLES = {'puzzle': '', 'solution': '(Solution)', 'answers': '(Answers)'}
+
+WHITE_CELL = '''
+    <div 
+        class="row-item" 
+        style="
+            background: white;
+            padding: 5px;
+            color: white; 
+            border: 1px solid black">
+        / 
+    </div>'''
+GREY_CELL = '''
+    <div 
+        class="row-item" 
+        style="
+            background: #727272;
+            padding: 5px; 
+            color: #727272; 
+            border: 1px solid black">
+        / 
+    </div>'''
+LETTER_CELL = '''
+    <div 
+        class="row-item"
+        style="
+            background: white;
+            padding: 5px;
+            color: black; 
+            border: 1px solid grey">
+        {}
+    </div>'''
+NUMBER_CELL = '''
+    <div 
+        class="row-item"
+        style="
+            background: white;
+            padding: 5px; 
+            color: black; 
+            border: 1px solid black">
+        {}
+    </div>'''
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(directory, name):
+    # Templates are compiled once per process.
+    return Environment(loader=FileSystemLoader(directory)).get_template(name)
 
 
 class CrosswordPuzzle:
@@ -17,308 +81,292 @@ class CrosswordPuzzle:
                     max_depth=5,
                     show_solution=False,
                     autogen=False,
+                    grid_storage='dict',
+                    cube_storage='auto',
+                    ordering='length',
+                    solver='greedy',
+                    seed=None,
+                    restarts='luby',
+                    workers=1,
+                    portfolio=False,
+                    parallel_scales=False,
+                    time_budget=None,
+                    cache=None,
                     ):
         
         self.title = title
         self.subtitle = subtitle
         self.words = words
         self.clues = clues
+        # Clue lookup by word; a repeated word keeps its first clue.
+        self.clue_map = {}
+        for word, clue in zip(words, clues):
+            self.clue_map.setdefault(word, clue)
         self.scale_factor = scale_factor
         self.max_depth = max_depth
         self.show_solution = show_solution
         self.autogen = autogen
-
-    def generate_guide_grid(self, length, crossword_grid, empty_space):
-        grid = []
-        for j in range(length):
-            row = []
-            for i in range(length):
-                if crossword_grid[j][i] != empty_space:
-                    row.append('+')
-                else:
-                    row.append('-')
-            grid.append(row)
-        return grid
-
-    def generate_guide_cube(self, length, crossword_cube, empty_space):
-        cube = []
-        for k in range(length):
-            plane = []
-            for j in range(length):
-                row = []
-                for i in range(length):
-                    if crossword_cube[k][j][i] != empty_space:
-                        row.append('+')
-                    else:
-                        row.append('-')
-                plane.append(row)
-            cube.append(plane)
-        return cube
-    
-    def number_words(self, words, length, dimension=2):
-        numbered_words = set()
-        if dimension == 2:
-            position = lambda word: word.x + word.y*length
+        self.grid_storage = grid_storage
+        self.cube_storage = cube_storage
+        self.ordering = ordering
+        if solver not in SOLVERS:
+            raise ValueError(f'Unknown solver: {solver}')
+        self.solver = solver
+        self.seed = seed
+        self.restarts = restarts
+        self.workers = workers
+        self.portfolio = portfolio
+        self.parallel_scales = parallel_scales
+        self.time_budget = time_budget
+        self.cache = cache
+
+    def get_board_deadline(self, deadline):
+        """Returns the deadline for searching one board, given the overall one."""
+        if not self.autogen:
+            return deadline
+        board_deadline = time.monotonic() + AUTOGEN_TIME_LIMIT
+        return board_deadline if deadline is None else min(deadline, board_deadline)
+
+    def search(self, engine, storage, scale_factor, crossword=None, stop_event=None, deadline=None):
+        """Runs one search at scale_factor, returning (crossword, words, scale_factor)."""
+        options = dict(max_depth=self.max_depth, storage=storage, ordering=self.ordering,
+                       seed=self.seed, restarts=self.restarts, deadline=self.get_board_deadline(deadline))
+        if self.autogen and self.parallel_scales:
+            # Batches go on until the overall deadline; each board counts its limit from its own start.
+            options.update(deadline=deadline, time_budget=AUTOGEN_TIME_LIMIT)
+            # Candidate scale factors run side by side, one per CPU unless workers is set.
+            workers = None if self.workers == 1 else self.workers
+            crossword, found_scale_factor = generate_scales(engine, self.words, scale_factor, workers=workers, solver=self.solver, **options)
+            if crossword is None:
+                return None, None, scale_factor
+            return crossword, crossword.words.values(), found_scale_factor
+        if self.portfolio:
+            # A portfolio runs one configuration per CPU unless workers is set.
+            workers = None if self.workers == 1 else self.workers
+            crossword, _ = generate_portfolio(engine, self.words, scale_factor, workers=workers, solver=self.solver,
+                                              **options)
+            return crossword, crossword.words.values() if crossword else None, scale_factor
+        if self.workers != 1:
+            crossword = generate_parallel(engine, self.words, scale_factor, self.workers, self.solver, **options)
+            return crossword, crossword.words.values() if crossword else None, scale_factor
+        if crossword is not None:
+            # Keep the best partial layout of the failed board and search on from it.
+            crossword.grow(scale_factor)
+            crossword.deadline = options['deadline']
         else:
-            position = lambda word: word.x + word.y*length + word.z*length**2
-        sorted_words = sorted([(word, position(word)) for word in words], key=lambda x: x[1])
-        prev_pos, prev_index = -1, -1
-        for word,pos in sorted_words:
-            if pos == prev_pos:
-                word.index = prev_index
-            else:
-                word.index = max(prev_index + 1, 1)
-            prev_pos = pos
-            prev_index = word.index
-            numbered_words.add(word)
-        return numbered_words
-
-    def generate2D(self):
-        words = None
-
-        while not words:
-            crossword = Grid(self.words, self.scale_factor, max_depth=self.max_depth)
-            words = crossword.generate()
-            if not words:
-                if not self.autogen:
-                    print('2D puzzle could not be generated. Trying increasing recursion limit or scale factor.')
-                    return None
-                self.scale_factor += 0.1
-                print(f'Increasing scale factor to {self.scale_factor}')
-        
-        length, empty_space, grid = crossword.length, crossword.empty_space, crossword.grid
-        guide_grid = self.generate_guide_grid(length, grid, empty_space)
-
-        html_grid = []
-
-        for y in range(length):
-            row = []
-            for x in range(length):
-                if guide_grid[y][x] == '+':
-                    row.append('''
-                                <div 
-                                    class="row-item" 
-                                    style="
-                                        background: white;
-                                        padding: 5px;
-                                        color: white; 
-                                        border: 1px solid black">
-                                    / 
-                                </div>'''
-                                )
-                else:
-                    row.append('''
-                                <div 
-                                    class="row-item" 
-                                    style="
-                                        background: #727272;
-                                        padding: 5px; 
-                                        color: #727272; 
-                                        border: 1px solid black">
-                                    / 
-                                </div>'''
-                                )
-            html_grid.append(row)
-
-        across_clues = []
-        down_clues = []
-        across = "<br><b>Across</b><br>"
-        down = "<br><b>Down</b><br>"
-
-        numbered_words = self.number_words(words, length)
-
-        for word in numbered_words:
-            index = word.index
-
-            if self.show_solution:
-                for j,letter in enumerate(word.value):
-                    x = word.x + j*word.x_sign
-                    y = word.y + j*word.y_sign
-
-                    html_grid[y][x] = f'''
-                        <div 
-                            class="row-item"
-                            style="
-                                background: white;
-                                padding: 5px;
-                                color: black; 
-                                border: 1px solid grey">
-                            {letter}
-                        </div>'''
-            else:
-                html_grid[word.y][word.x] = f'''
-                    <div 
-                        class="row-item"
-                        style="
-                            background: white;
-                            padding: 5px; 
-                            color: black; 
-                            border: 1px solid black">
-                        {index}
-                    </div>'''
-
-            if word.x_sign:
-                across_clues.append((index, f'<br>{index}. {self.clues[self.words.index(word.value)]}'))
-            else:
-                down_clues.append((index, f'<br>{index}. {self.clues[self.words.index(word.value)]}'))
-                                  
-        for (_,clue) in sorted(across_clues, key=lambda x: x[0]):
-            across += clue
-        for (_,clue) in sorted(down_clues, key=lambda x: x[0]):
-            down += clue
-        
-        html_output = f'<h1 id="title"> {self.title} {self.show_solution*"(Solution)"} </h1>'
-        html_output += f'<div id="subtitle">{self.subtitle}</div>'
-        for row in html_grid:
-            html_output += '<section class="grid-row">' + ''.join(row) + '</section>'
-
-        puzzle_html = html_output + '<br><br>'
+            crossword = engine(self.words, scale_factor, **options)
+        crossword.stop_event = stop_event
+        return crossword, solve(crossword, self.solver), scale_factor
+
+    def check_feasibility(self, dimension, scale_factor=None):
+        """Returns the scale factor to start searching at, or None when no layout is possible."""
+        scale_factor = self.scale_factor if scale_factor is None else scale_factor
+        analysis = FeasibilityAnalysis(self.words, dimension)
+        if not analysis.is_feasible():
+            print(f'{dimension}D puzzle cannot be generated. {analysis.get_diagnostic()}')
+            return None
+        if self.autogen:
+            min_scale_factor = analysis.get_min_scale_factor(scale_factor)
+            if min_scale_factor != scale_factor:
+                scale_factor = min_scale_factor
+                print(f'Starting at scale factor {scale_factor}')
+        elif math.floor(analysis.pivot_length * scale_factor) < analysis.min_length:
+            print(f'{dimension}D puzzle cannot be generated at this scale factor. {analysis.get_diagnostic()}')
+            return None
+        return scale_factor
+
+    def generate_crossword(self, dimension, stop_event=None):
+        """Searches for a 2D or 3D layout.
+
+        Returns the crossword, its words and the scale factor it was found
+        at, or (None, None, None). The puzzle itself is left unchanged, so
+        one instance can serve several searches at once. A set stop_event
+        ends the search early.
+
+        With a time_budget, the search stops once it runs out and returns
+        the best partial layout found, whose missing words are listed by
+        crossword.get_unplaced_words(). The parallel search modes only
+        return complete layouts.
+        """
+        deadline = time.monotonic() + self.time_budget if self.time_budget is not None else None
+        scale_factor = self.check_feasibility(dimension)
+        if scale_factor is None:
+            return None, None, None
+        engine, storage = (Grid, self.grid_storage) if dimension == 2 else (Cube, self.cube_storage)
+        pivot_length = max(map(len, self.words))
 
-        jinja_env = Environment(loader=FileSystemLoader(f'{os.getcwd()}/templates'))
-        template = jinja_env.get_template('template_2d.html')
-        output = template.render(puzzle=puzzle_html, across=across, down=down)
-
-        if not os.path.exists('output'):
-            os.mkdir('output')
-            
-        with open(f'output/{"_".join(self.title.lower().split(" "))}{self.show_solution*"_solution"}_2d.html', 'w') as f:
-            f.write(output)
-        print('2D Puzzle created!')
-    
-    def generate3D(self):
         words = None
-
+        crossword = None
         while not words:
-            crossword = Cube(self.words, self.scale_factor, max_depth=self.max_depth)
-            try:
-                words = crossword.generate()
-            except(TypeError):
-                # TODO: fix cube index issue or check if generation is impossible.
-                print('3D puzzle could not be generated.')
+            crossword, words, scale_factor = self.search(engine, storage, scale_factor, crossword, stop_event, deadline)
             if not words:
+                if stop_event is not None and stop_event.is_set():
+                    print(f'{dimension}D puzzle generation stopped.')
+                    return None, None, None
+                if deadline is not None and time.monotonic() >= deadline:
+                    if crossword is None or not crossword.trail:
+                        print(f'{dimension}D puzzle could not be generated within the time budget.')
+                        return None, None, None
+                    unplaced = crossword.get_unplaced_words()
+                    print(f'Time budget exhausted. {len(unplaced)} words could not be placed: {", ".join(unplaced)}')
+                    return crossword, [crossword.words[i] for i in crossword.trail], scale_factor
                 if not self.autogen:
-                    print('3D puzzle could not be generated. Trying increasing recursion limit or scale factor.')
-                    return None
-                print(f'Increasing scale factor to: {self.scale_factor}')
-                self.scale_factor += 0.1
-        
-        length, empty_space, cube = crossword.length, crossword.empty_space, crossword.cube
-        guide_cube = self.generate_guide_cube(length, cube, empty_space)
-
-        html_cube = []
-
-        skipped_layers = []
-        for z in range(length):
-            page = []
-            skipped = True
-            for y in range(length):
-                row = []
-                for x in range(length):
-                    if guide_cube[z][y][x] == '+':
-                        skipped = False
-                        row.append('''
-                                   <div 
-                                        class="row-item" 
-                                        style="
-                                            background: white;
-                                            padding: 5px;
-                                            color: white; 
-                                            border: 1px solid black">
-                                        / 
-                                   </div>'''
-                                   )
-                    else:
-                        row.append('''
-                                   <div 
-                                        class="row-item" 
-                                        style="
-                                            background: #727272;
-                                            padding: 5px; 
-                                            color: #727272; 
-                                            border: 1px solid black">
-                                        / 
-                                   </div>'''
-                                   )
-                page.append(row)
-            if skipped:
-                skipped_layers.append(z)
-            html_cube.append(page)
-
-        across_clues = []
-        down_clues = []
-        vertical_clues = []
-        across = "<br><b>Across</b><br>"
-        down = "<br><b>Down</b><br>"
-        vertical = "<br><b>Vertical</b><br>"
-
-        numbered_words = self.number_words(words, length, dimension=3)
-
-        for word in numbered_words:
-            index = word.index
-
-            if self.show_solution:
-                for j,letter in enumerate(word.value):
-                    x = word.x + j*word.x_sign
-                    y = word.y + j*word.y_sign
-                    z = word.z + j*word.z_sign
-
-                    html_cube[z][y][x] = f'''
-                        <div 
-                            class="row-item"
-                            style="
-                                background: white;
-                                padding: 5px;
-                                color: black; 
-                                border: 1px solid grey">
-                            {letter}
-                        </div>'''
-            else:
-                html_cube[word.z][word.y][word.x] = f'''
-                    <div 
-                        class="row-item"
-                        style="
-                            background: white;
-                            padding: 5px; 
-                            color: black; 
-                            border: 1px solid black">
-                        {index}
-                    </div>'''
-
-            if word.x_sign:
-                across_clues.append((index, f'<br>{index}. {self.clues[self.words.index(word.value)]}'))
-            elif word.y_sign:
-                down_clues.append((index, f'<br>{index}. {self.clues[self.words.index(word.value)]}'))
-            else:
-                vertical_clues.append((index, f'<br>{index}. {self.clues[self.words.index(word.value)]}'))
-                                  
-        for (_,clue) in sorted(across_clues, key=lambda x: x[0]):
-            across += clue
-        for (_,clue) in sorted(down_clues, key=lambda x: x[0]):
-            down += clue
-        for (_,clue) in sorted(vertical_clues, key=lambda x: x[0]):
-            vertical += clue
-
-        html_output = f'<h1 id="title"> {self.title} {self.show_solution*"(Solution)"} </h1>'
-        html_output += f'<div id="subtitle">{self.subtitle}</div>'
-        layer_number = 0
-        for layer,page in enumerate(html_cube):
-            if layer in skipped_layers:
-                continue
-            layer_number += 1
-            html_output += f'<h2>Layer {layer_number} </h2>'
-            for row in page:
-                html_output += '<section class="cube-row">' + ''.join(row) + '</section>'
-            html_output += '<br><br><div style="page-break-before: always"<br><br>'
-
-        puzzle_html = html_output + '<br><br>'
-
-        jinja_env = Environment(loader=FileSystemLoader(f'{os.getcwd()}/templates'))
-        template = jinja_env.get_template('template_3d.html')
-        output = template.render(puzzle=puzzle_html, across=across, down=down, vertical=vertical)
-
+                    print(f'{dimension}D puzzle could not be generated. Trying increasing recursion limit or scale factor.')
+                    return None, None, None
+                # Steps that leave the board length unchanged would repeat the same search.
+                length = math.floor(pivot_length * scale_factor)
+                while math.floor(pivot_length * scale_factor) == length:
+                    scale_factor += 0.1
+                print(f'Increasing scale factor to {scale_factor}')
+        return crossword, words, scale_factor
+
+    def get_cache_key(self, dimension):
+        # Storage backends do not change the layout found, so they are left out.
+        options = dict(max_depth=self.max_depth, autogen=self.autogen, ordering=self.ordering, solver=self.solver,
+                       seed=self.seed, restarts=self.restarts, workers=self.workers, portfolio=self.portfolio,
+                       parallel_scales=self.parallel_scales)
+        return get_cache_key(self.words, dimension, self.scale_factor, options)
+
+    def solve(self, dimension=2, stop_event=None):
+        """Searches for a 2D or 3D layout and returns it as a Layout, or None.
+
+        The layout can be rendered any number of times without searching
+        again. With a LayoutCache, a complete layout is stored under the
+        words and search options, and the search is skipped when one is
+        already there.
+        """
+        if self.cache is not None:
+            key = self.get_cache_key(dimension)
+            record = self.cache.get(key)
+            if record is not None:
+                print(f'Using cached {dimension}D layout')
+                return load_layout(record, self.clue_map)
+
+        crossword, words, scale_factor = self.generate_crossword(dimension, stop_event)
+        if not words:
+            return None
+        layout = create_layout(crossword, self.clue_map, scale_factor)
+        if self.cache is not None and not layout.unplaced:
+            self.cache.put(key, layout.to_record())
+        return layout
+
+    def render(self, layout, variants=None):
+        """Renders a layout as one HTML page per variant.
+
+        'puzzle' numbers the first letter of every word, 'solution' fills in
+        every letter and 'answers' lists each clue with its answer. The
+        default is the puzzle, or the solution with show_solution set.
+        Returns a dict of variant to HTML.
+        """
+        if variants is None:
+            variants = ['solution' if self.show_solution else 'puzzle']
+        for variant in variants:
+            if variant not in VARIANTS:
+                raise ValueError(f'Unknown variant: {variant}')
+        if layout.dimension == 2:
+            return self.render2D(layout, variants)
+        return self.render3D(layout, variants)
+
+    def write_output(self, html, dimension, variant='puzzle'):
         if not os.path.exists('output'):
             os.mkdir('output')
 
-        with open(f'output/{"_".join(self.title.lower().split(" "))}{self.show_solution*"_solution"}_3d.html', 'w') as f:
-            f.write(output)
-        print('3D Puzzle created!')
+        suffix = '' if variant == 'puzzle' else f'_{variant}'
+        with open(f'output/{"_".join(self.title.lower().split(" "))}{suffix}_{dimension}d.html', 'w') as f:
+            f.write(html)
+        print(f'{dimension}D Puzzle created!')
+
+    def generate2D(self, variants=None):
+        layout = self.solve(2)
+        if layout is None:
+            return None
+        for variant, html in self.render(layout, variants).items():
+            self.write_output(html, 2, variant)
+        return layout
+
+    def generate3D(self, variants=None):
+        layout = self.solve(3)
+        if layout is None:
+            return None
+        for variant, html in self.render(layout, variants).items():
+            self.write_output(html, 3, variant)
+        return layout
+
+    async def generate2D_async(self, pool=None):
+        """Searches and renders the 2D puzzle in a worker process.
+
+        Returns (layout, html) without printing or writing files, or None
+        when no layout is found. Cancelling the call stops its search.
+        """
+        return await (pool or get_default_pool()).generate(self, 2)
+
+    async def generate3D_async(self, pool=None):
+        return await (pool or get_default_pool()).generate(self, 3)
+
+    def get_clues(self, layout, variant):
+        clues = {direction: [] for direction in DIRECTIONS[:layout.dimension]}
+        for word in sorted(layout.words, key=lambda word: word.number):
+            answer = f' <i>{word.value}</i>' if variant == 'answers' else ''
+            clues[word.get_direction()].append(f'<br>{word.number}. {word.clue}{answer}')
+        return {direction: f'<br><b>{direction.capitalize()}</b><br>' + ''.join(lines)
+                for direction, lines in clues.items()}
+
+    def get_title(self, variant):
+        html_output = f'<h1 id="title"> {self.title} {VARIANT_TITLES[variant]} </h1>'
+        html_output += f'<div id="subtitle">{self.subtitle}</div>'
+        return html_output
+
+    def fill_cells(self, layout, variant, get_cells):
+        """Writes the letter or number cells of a variant into the blank board cells."""
+        if variant == 'solution':
+            for word in layout.words:
+                for (x, y, z), letter in zip(word.get_cells(), word.value):
+                    get_cells(z)[y][x] = LETTER_CELL.format(letter)
+        else:
+            for word in layout.words:
+                get_cells(word.z)[word.y][word.x] = NUMBER_CELL.format(word.number)
+
+    def render2D(self, layout, variants):
+        length = layout.length
+        blank_grid = [[WHITE_CELL if layout.get_letter(x, y) else GREY_CELL for x in range(length)]
+                      for y in range(length)]
+        clues = {variant: self.get_clues(layout, variant) for variant in set(variants)}
+        template = get_template(f'{os.getcwd()}/templates', 'template_2d.html')
+
+        pages = {}
+        for variant in variants:
+            html_output = self.get_title(variant)
+            if variant != 'answers':
+                html_grid = [list(row) for row in blank_grid]
+                self.fill_cells(layout, variant, lambda z: html_grid)
+                for row in html_grid:
+                    html_output += '<section class="grid-row">' + ''.join(row) + '</section>'
+
+            puzzle_html = html_output + '<br><br>'
+            pages[variant] = template.render(puzzle=puzzle_html, **clues[variant])
+        return pages
+
+    def render3D(self, layout, variants):
+        length = layout.length
+        blank_cube = [[[WHITE_CELL if layout.get_letter(x, y, z) else GREY_CELL for x in range(length)]
+                       for y in range(length)] for z in range(length)]
+        # Layers without letters are left out.
+        layers = sorted({z for (_, _, z) in layout.letters})
+        clues = {variant: self.get_clues(layout, variant) for variant in set(variants)}
+        template = get_template(f'{os.getcwd()}/templates', 'template_3d.html')
+
+        pages = {}
+        for variant in variants:
+            html_output = self.get_title(variant)
+            if variant != 'answers':
+                html_cube = [[list(row) for row in page] for page in blank_cube]
+                self.fill_cells(layout, variant, lambda z: html_cube[z])
+                for layer_number, layer in enumerate(layers, 1):
+                    html_output += f'<h2>Layer {layer_number} </h2>'
+                    for row in html_cube[layer]:
+                        html_output += '<section class="cube-row">' + ''.join(row) + '</section>'
+                    html_output += '<br><br><div style="page-break-before: always"<br><br>'
+
+            puzzle_html = html_output + '<br><br>'
+            pages[variant] = template.render(puzzle=puzzle_html, **clues[variant])
+        return pages
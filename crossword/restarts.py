@@ -0,0 +1,35 @@
+import math
+
+GEOMETRIC_FACTOR = 1.5
+
+
+def luby(i):
+    """i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def geometric(i):
+    return math.ceil(GEOMETRIC_FACTOR ** (i - 1))
+
+
+RESTART_SCHEDULES = {'luby': luby, 'geometric': geometric}
+
+
+def get_pivot_permutation(rng, count):
+    # i -> (a*i + b) % count visits every position once for any a coprime
+    # with count, so a random pivot order needs no list of positions.
+    a = 1
+    if count > 2:
+        a = rng.randrange(1, count)
+        while math.gcd(a, count) != 1:
+            a = rng.randrange(1, count)
+    b = rng.randrange(count) if count else 0
+    return lambda i: (a * i + b) % count
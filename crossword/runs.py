@@ -0,0 +1,57 @@
+class RunIndex:
+
+    """Contiguous runs of letters along every axis of a board.
+
+    Cells are packed positions (x + y*length [+ z*length**2]). For each axis
+    every occupied cell maps to the start of its run, and every run start maps
+    to the run's letters, so both are updated locally as cells fill or empty.
+    """
+
+    def __init__(self, length, dimension):
+        self.length = length
+        self.strides = tuple(length ** axis for axis in range(dimension))
+        self.starts = tuple({} for _ in range(dimension))
+        self.texts = tuple({} for _ in range(dimension))
+
+    def is_occupied(self, position):
+        return position in self.starts[0]
+
+    def add(self, position, letter):
+        n = self.length
+        for stride, starts, texts in zip(self.strides, self.starts, self.texts):
+            coordinate = (position // stride) % n
+            start = position
+            text = letter
+            if coordinate > 0 and position - stride in starts:
+                start = starts[position - stride]
+                text = texts.pop(start) + text
+            starts[position] = start
+            after = position + stride
+            if coordinate < n - 1 and after in starts:
+                after_text = texts.pop(after)
+                for i in range(len(after_text)):
+                    starts[after + i * stride] = start
+                text += after_text
+            texts[start] = text
+
+    def discard(self, position):
+        for stride, starts, texts in zip(self.strides, self.starts, self.texts):
+            start = starts.pop(position)
+            text = texts.pop(start)
+            i = (position - start) // stride
+            if i:
+                texts[start] = text[:i]
+            after_text = text[i + 1:]
+            if after_text:
+                after = position + stride
+                for j in range(len(after_text)):
+                    starts[after + j * stride] = after
+                texts[after] = after_text
+
+    def get_letters(self, position, axis, direction):
+        start = self.starts[axis].get(position)
+        if start is None:
+            return ''
+        i = (position - start) // self.strides[axis]
+        text = self.texts[axis][start]
+        return text[:i + 1] if direction < 0 else text[i:]
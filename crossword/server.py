@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from crossword.batch import solve_puzzle
+from crossword.puzzle import get_template
+
+# Finished jobs kept for status requests, oldest dropped first.
+MAX_FINISHED_JOBS = 10000
+# Recent jobs the latency metrics are taken over.
+LATENCY_WINDOW = 1000
+
+
+def warm_up():
+    # Workers compile the templates before their first job.
+    for name in ('template_2d.html', 'template_3d.html'):
+        try:
+            get_template(f'{os.getcwd()}/templates', name)
+        except Exception:
+            pass
+    return os.getpid()
+
+
+def get_percentile(values, percentile):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(percentile * len(values)))]
+
+
+class JobQueue:
+
+    """Bounded queue of puzzle jobs solved by a fixed pool of worker processes.
+
+    At most max_queue jobs wait behind the ones being solved, and submit()
+    refuses a payload that does not fit instead of blocking.
+    """
+
+    def __init__(self, workers=None, max_queue=64, dimensions=(2, 3), render=False, **options):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.dimensions = dimensions
+        self.render = render
+        self.options = options
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.futures = {}
+        self.finished = deque()
+        self.num_jobs = 0
+        self.counts = {'ok': 0, 'partial': 0, 'failed': 0, 'error': 0, 'rejected': 0}
+        self.solve_times = deque(maxlen=LATENCY_WINDOW)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start every worker now so no request pays for process start-up.
+        for future in [self.executor.submit(warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, records):
+        """Queues one job per record, returning the jobs, or None when the queue is full."""
+        with self.lock:
+            if len(self.futures) + len(records) > self.workers + self.max_queue:
+                self.counts['rejected'] += len(records)
+                return None
+            jobs = []
+            for record in records:
+                job = {'id': str(self.num_jobs), 'name': record.get('name', str(self.num_jobs)),
+                       'status': 'queued', 'submitted': time.time()}
+                self.jobs[job['id']] = job
+                self.num_jobs += 1
+                jobs.append(job)
+            for record, job in zip(records, jobs):
+                self.futures[job['id']] = self.executor.submit(solve_puzzle, int(job['id']), record, self.dimensions,
+                                                               self.options, self.render)
+        for job in jobs:
+            self.futures[job['id']].add_done_callback(lambda future, job=job: self.finish(job, future))
+        return [dict(job) for job in jobs]
+
+    def finish(self, job, future):
+        finished = time.time()
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'status': 'error', 'message': repr(e), 'results': []}
+        with self.lock:
+            job['status'] = result['status']
+            job['finished'] = finished
+            job['result'] = result
+            del self.futures[job['id']]
+            self.counts[result['status']] += 1
+            self.latencies.append(finished - job['submitted'])
+            self.solve_times.append(sum(entry.get('seconds', 0) for entry in result['results']))
+            self.finished.append(job['id'])
+            if len(self.finished) > MAX_FINISHED_JOBS:
+                del self.jobs[self.finished.popleft()]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self.futures.get(job_id)
+        if future is not None and future.running():
+            job['status'] = 'running'
+        return job
+
+    def get_metrics(self):
+        with self.lock:
+            running = sum(future.running() for future in self.futures.values())
+            solve_times = list(self.solve_times)
+            latencies = list(self.latencies)
+            metrics = {
+                'workers': self.workers,
+                'queue_depth': len(self.futures) - running,
+                'max_queue': self.max_queue,
+                'running': running,
+                'submitted': self.num_jobs,
+                **self.counts,
+            }
+        for name, values in (('solve_seconds', solve_times), ('latency_seconds', latencies)):
+            metrics[name] = {
+                'mean': sum(values) / len(values) if values else None,
+                'p50': get_percentile(values, 0.5),
+                'p95': get_percentile(values, 0.95),
+                'max': max(values) if values else None,
+            }
+        return metrics
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def parse_payload(body):
+    """Reads puzzle records from a data.json shaped payload: {name: {word: clue}}."""
+    data = json.loads(body)
+    if not isinstance(data, dict) or not data:
+        raise ValueError('Expected an object of named puzzles.')
+    records = []
+    for name, words in data.items():
+        if not isinstance(words, dict) or not words:
+            raise ValueError(f'Puzzle {name} must map words to clues.')
+        records.append({'name': name, 'words': words})
+    return records
+
+
+class PuzzleRequestHandler(BaseHTTPRequestHandler):
+
+    """POST /jobs queues the puzzles of a payload, GET /jobs/<id> reports one and GET /metrics the queue."""
+
+    def send_json(self, status, data, headers=()):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            return self.send_json(200, self.server.jobs.get_metrics())
+        if self.path.startswith('/jobs/'):
+            job = self.server.jobs.get(self.path[len('/jobs/'):])
+            if job is not None:
+                return self.send_json(200, job)
+        self.send_json(404, {'error': f'Not found: {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            return self.send_json(404, {'error': f'Not found: {self.path}'})
+        try:
+            records = parse_payload(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError as e:
+            return self.send_json(400, {'error': str(e)})
+        jobs = self.server.jobs.submit(records)
+        if jobs is None:
+            return self.send_json(503, {'error': 'Job queue is full.'}, [('Retry-After', '1')])
+        self.send_json(202, {'jobs': jobs})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host='127.0.0.1', port=8000, verbose=True, **options):
+    """Starts the worker pool and returns an HTTP server bound to host and port.
+
+    options are passed to JobQueue. Port 0 picks a free port, readable from
+    server.server_address.
+    """
+    server = ThreadingHTTPServer((host, port), PuzzleRequestHandler)
+    server.jobs = JobQueue(**options)
+    server.verbose = verbose
+    return server
+
+
+def serve(host='127.0.0.1', port=8000, **options):
+    server = create_server(host, port, **options)
+    print(f'Serving puzzles on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.jobs.shutdown()
@@ -0,0 +1,101 @@
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from crossword.word import Word2D, Word3D
+
+# Block layout, little endian:
+#   header   magic, dimension, length, number of words, sequence, placed words
+#   words    one (index, x, y, z, axis) record per placed word, in placement order
+HEADER = struct.Struct('<4sHHHQH')
+WORD = struct.Struct('<HHHHB')
+MAGIC = b'XWL2'
+
+# Seconds between attempts to read a layout while a write is in progress,
+# and the attempts made before giving up.
+READ_RETRY_DELAY = 0.0001
+MAX_READ_RETRIES = 10000
+
+
+class SharedLayout:
+
+    """Word placements of a Grid or Cube in a shared memory block.
+
+    A worker writes its layout with write(), and any process that knows the
+    block's name and the word list reads it back, e.g. to render it with
+    create_layout(). The header's sequence number is odd while a write is in
+    progress, so readers retry instead of seeing a half-written layout.
+    """
+
+    def __init__(self, words, dimension, length, name=None):
+        self.word_list = words
+        self.dimension = dimension
+        self.length = length
+        self.words_offset = HEADER.size
+        if name is None:
+            self.memory = SharedMemory(create=True, size=HEADER.size + WORD.size * len(words))
+            HEADER.pack_into(self.memory.buf, 0, MAGIC, dimension, length, len(words), 0, 0)
+        else:
+            self.memory = SharedMemory(name=name)
+            magic, *shape, _, _ = HEADER.unpack_from(self.memory.buf, 0)
+            if magic != MAGIC or shape != [dimension, length, len(words)]:
+                raise ValueError(f'Shared memory block {name} does not hold this layout.')
+        self.name = self.memory.name
+        self.words = {}
+
+    def get_sequence(self):
+        return HEADER.unpack_from(self.memory.buf, 0)[4]
+
+    def set_sequence(self, sequence, num_placed):
+        HEADER.pack_into(self.memory.buf, 0, MAGIC, self.dimension, self.length, len(self.word_list), sequence, num_placed)
+
+    def write(self, crossword):
+        layout = crossword.get_layout()
+        sequence = self.get_sequence()
+        self.set_sequence(sequence + 1, 0)
+        for i, entry in enumerate(layout):
+            position, orientation = entry[1:-1], entry[-1]
+            x, y, z = (tuple(position) + (0,))[:3]
+            WORD.pack_into(self.memory.buf, self.words_offset + i * WORD.size, entry[0], x, y, z, orientation.index(1))
+        self.set_sequence(sequence + 2, len(layout))
+
+    def read_layout(self):
+        # Retry until no write started or finished while the records were copied.
+        for _ in range(MAX_READ_RETRIES):
+            sequence, num_placed = HEADER.unpack_from(self.memory.buf, 0)[4:]
+            if not sequence % 2:
+                records = [WORD.unpack_from(self.memory.buf, self.words_offset + i * WORD.size) for i in range(num_placed)]
+                if self.get_sequence() == sequence:
+                    break
+            time.sleep(READ_RETRY_DELAY)
+        else:
+            raise RuntimeError(f'Shared layout {self.name} kept changing while it was read.')
+
+        layout = []
+        for index, x, y, z, axis in records:
+            orientation = tuple(int(i == axis) for i in range(self.dimension))
+            position = (x, y) if self.dimension == 2 else (x, y, z)
+            layout.append((index,) + position + (orientation,))
+        return layout
+
+    def load_words(self):
+        """Builds Word objects for the placed words, as in crossword.words."""
+        self.words = {}
+        for entry in self.read_layout():
+            index, orientation = entry[0], entry[-1]
+            if self.dimension == 2:
+                word = Word2D(self.word_list[index], index, *entry[1:3], board_length=self.length)
+            else:
+                word = Word3D(self.word_list[index], index, *entry[1:4], board_length=self.length)
+            while word.get_orientation() != orientation:
+                word.rotate()
+            self.words[index] = word
+        return self.words.values()
+
+    def get_unplaced_words(self):
+        return [word for index, word in enumerate(self.word_list) if index not in self.words]
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
@@ -0,0 +1,158 @@
+class BacktrackingSolver:
+
+    """Depth-first search over word placements for a Grid or Cube.
+
+    After the pivot, the word with the fewest valid placements is placed next
+    (minimum remaining values). Every node forward checks the remaining words
+    and backtracks as soon as one of them can no longer be placed: a word
+    without placements must cross a remaining word that still has some, or
+    that crosses one in turn. A run of letters that is not a word yet must
+    be completed by a remaining word placed along it, so such runs are
+    completed first and fail the node when no word can complete them.
+    Candidate placements are carried down the search and only rechecked
+    near the cells a placement fills.
+
+    When none of the chosen word's placements lead to a solution, they are
+    excluded and the search goes on without the word, since it may still
+    cross a word placed later. The search is therefore complete for the
+    board. Failed states, the board together with its exclusions, are
+    recorded in the crossword's transposition table, so other placement
+    orders reaching the same state are pruned at once.
+    """
+
+    def __init__(self, crossword):
+        self.crossword = crossword
+        self.excluded = [set() for _ in range(crossword.num_words)]
+        # XOR of the keys of the excluded placements, combined with the board's hash.
+        self.excluded_hash = 0
+
+    def solve(self):
+        crossword = self.crossword
+        # Try to complete a layout already on the board, e.g. after grow(), first.
+        if crossword.trail and self.search():
+            return crossword.words.values()
+        crossword.reset()
+        pivot_word = crossword.pivot_word
+        for pivot_position in crossword.get_pivot_positions():
+            if not crossword.place_pivot(pivot_word, pivot_position):
+                continue
+            if self.search():
+                return crossword.words.values()
+            if crossword.is_stopped():
+                if crossword.is_expired():
+                    crossword.restore_best_layout()
+                return None
+            crossword.rollback()
+        return None
+
+    def search(self, candidates=None):
+        crossword = self.crossword
+        state = crossword.hash ^ self.excluded_hash
+        if crossword.is_stopped() or state in crossword.failed_states:
+            return False
+        if self.expand(candidates):
+            return True
+        if not crossword.is_stopped():
+            crossword.failed_states.add(state)
+        return False
+
+    def expand(self, candidates):
+        crossword = self.crossword
+        crossword.record_best_layout()
+        remaining_indexes = crossword.get_remaining_indexes()
+        if not remaining_indexes:
+            return crossword.check_runs()
+        if candidates is None:
+            if not crossword.check_runs():
+                return False
+            candidates = {i: crossword.get_placements(crossword.words[i]) for i in remaining_indexes}
+
+        available = {i: [p for p in candidates[i] if p not in self.excluded[i]] for i in remaining_indexes}
+        if not self.is_reachable(available, remaining_indexes):
+            return False
+        completions = self.get_completions(available)
+        if completions is not None:
+            # An open run can only be completed by one of these, so no word is held back.
+            return any(self.try_placement(candidates, i, placement) for i, placement in completions)
+
+        best_index = min((i for i in remaining_indexes if available[i]), key=lambda i: len(available[i]))
+        for placement in available[best_index]:
+            if self.try_placement(candidates, best_index, placement):
+                return True
+            if crossword.is_stopped():
+                return False
+
+        # Go on without the word: a word placed later may give it new placements.
+        self.exclude(best_index, available[best_index])
+        if self.search(candidates):
+            return True
+        self.include(best_index, available[best_index])
+        return False
+
+    def try_placement(self, candidates, index, placement):
+        crossword = self.crossword
+        word = crossword.words[index]
+        checkpoint = crossword.checkpoint()
+        new_cells = crossword.insert_placement(word, placement)
+        if crossword.check_runs() and self.search(self.update_candidates(candidates, word, new_cells)):
+            return True
+        crossword.rollback(checkpoint)
+        return False
+
+    def get_completions(self, available):
+        # Every run of letters that is not a word yet has to become a remaining
+        # word placed along it. Returns the placements completing the run with
+        # the fewest of them, an empty list when some run cannot be completed,
+        # or None when every run is a word.
+        best = None
+        for letters, placement in self.crossword.get_open_runs():
+            completions = [(i, placement) for i in self.crossword.trie.find_remaining(letters)
+                           if placement in available[i]]
+            if best is None or len(completions) < len(best):
+                best = completions
+                if not best:
+                    break
+        return best
+
+    def exclude(self, index, placements):
+        self.excluded[index].update(placements)
+        self.update_excluded_hash(index, placements)
+
+    def include(self, index, placements):
+        self.excluded[index].difference_update(placements)
+        self.update_excluded_hash(index, placements)
+
+    def update_excluded_hash(self, index, placements):
+        for placement in placements:
+            self.excluded_hash ^= self.crossword.zobrist.get_key(index, placement)
+
+    def is_reachable(self, candidates, remaining_indexes):
+        # Words with placements can be placed now. Any other word needs an
+        # anchor from a remaining word that can be placed, now or later.
+        crossings = self.crossword.crossings.crossings
+        reachable = [i for i in remaining_indexes if candidates[i]]
+        unreached = set(remaining_indexes).difference(reachable)
+        while reachable and unreached:
+            crossed = unreached.intersection(crossings[reachable.pop()])
+            unreached -= crossed
+            reachable.extend(crossed)
+        return not unreached
+
+    def update_candidates(self, candidates, placed_word, new_cells):
+        crossword = self.crossword
+        updated = {}
+        for i in crossword.get_remaining_indexes():
+            word = crossword.words[i]
+            placements = crossword.filter_placements(word, candidates[i], new_cells)
+            placements.extend(crossword.get_placements(word, placed_word))
+            updated[i] = list(dict.fromkeys(placements))
+        return updated
+
+
+SOLVERS = ('greedy', 'backtracking')
+
+
+def solve(crossword, solver='greedy'):
+    if solver == 'backtracking':
+        return BacktrackingSolver(crossword).solve()
+    return crossword.generate()
@@ -0,0 +1,52 @@
+import random
+from collections import OrderedDict
+
+
+class ZobristKeys:
+
+    """Random 64-bit keys for every (word index, insertion entry) pair.
+
+    The insertion entry already encodes a word's position and orientation, so
+    a board's hash is the XOR of the keys of its placed words and is updated
+    in constant time as words are placed or removed. Keys are drawn on first
+    use instead of for every cell of the board.
+    """
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.keys = {}
+
+    def get_key(self, index, entry):
+        key = self.keys.get((index, entry))
+        if key is None:
+            key = self.keys[(index, entry)] = self.random.getrandbits(64)
+        return key
+
+
+class TranspositionTable:
+
+    """Bounded set of board hashes known to fail, evicting the least recently used."""
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.states = OrderedDict()
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, state):
+        if state in self.states:
+            self.states.move_to_end(state)
+            return True
+        return False
+
+    def add(self, state):
+        if self.capacity <= 0:
+            return
+        self.states[state] = True
+        self.states.move_to_end(state)
+        if len(self.states) > self.capacity:
+            self.states.popitem(last=False)
+
+    def clear(self):
+        self.states.clear()
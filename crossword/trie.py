@@ -0,0 +1,72 @@
+class TrieNode:
+
+    def __init__(self):
+        self.children = {}
+        self.remaining = 0
+        self.terminal = False
+
+
+class WordTrie:
+
+    """Prefix index over a word list.
+
+    Every node keeps a bitmask of the word indexes that start with its prefix
+    and have not been placed yet, so prefix and exact word queries cost
+    O(prefix length) instead of a scan over the word list.
+    """
+
+    def __init__(self, words):
+        self.words = words
+        self.root = TrieNode()
+        for word in words:
+            node = self.root
+            for letter in word:
+                node = node.children.setdefault(letter, TrieNode())
+            node.terminal = True
+        self.reset()
+
+    def find_node(self, prefix):
+        node = self.root
+        for letter in prefix:
+            node = node.children.get(letter)
+            if node is None:
+                return None
+        return node
+
+    def update_path(self, index, placed):
+        bit = 1 << index
+        node = self.root
+        for letter in self.words[index]:
+            node = node.children[letter]
+            if placed:
+                node.remaining &= ~bit
+            else:
+                node.remaining |= bit
+
+    def mark_placed(self, index):
+        self.update_path(index, True)
+
+    def mark_unplaced(self, index):
+        self.update_path(index, False)
+
+    def reset(self):
+        for i in range(len(self.words)):
+            self.mark_unplaced(i)
+
+    def contains(self, word):
+        node = self.find_node(word)
+        return node is not None and node.terminal
+
+    def find_remaining(self, prefix, exclude=None):
+        node = self.find_node(prefix)
+        if node is None:
+            return []
+        mask = node.remaining
+        if exclude is not None:
+            mask &= ~(1 << exclude)
+        indexes = []
+        while mask:
+            bit = mask & -mask
+            indexes.append(bit.bit_length() - 1)
+            mask ^= bit
+        return indexes
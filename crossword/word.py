@@ -1,22 +1,34 @@
 class Word2D:
-    def __init__(self, value, index, x = None, y = None):
+
+    __slots__ = ('value', 'length', 'x_sign', 'y_sign', 'index', 'board_length', 'insertion_history', 'x', 'y')
+
+    def __init__(self, value, index, x = None, y = None, board_length = 0):
         self.value = value
         self.length = len(value)
         self.x_sign = 1
         self.y_sign = 0
         self.index = index
-        self.insertion_history = set()
+        # One bit per (position, orientation) on a board_length square grid.
+        self.board_length = board_length
+        self.insertion_history = bytearray((board_length * board_length * 2 + 7) // 8)
         self.x = x
         self.y = y
 
     def clear_insertion_history(self):
-        self.insertion_history = set()
+        self.insertion_history[:] = bytes(len(self.insertion_history))
+
+    def set_board_length(self, board_length):
+        self.board_length = board_length
+        self.insertion_history = bytearray((board_length * board_length * 2 + 7) // 8)
 
     def generate_insertion_entry(self):
-        return f'{self.x}-{self.y}-{self.x_sign}'
+        return (self.y * self.board_length + self.x) * 2 + self.y_sign
 
     def add_insertion_entry(self, insertion):
-        self.insertion_history.add(insertion)
+        self.insertion_history[insertion >> 3] |= 1 << (insertion & 7)
+
+    def has_insertion_entry(self, insertion):
+        return self.insertion_history[insertion >> 3] >> (insertion & 7) & 1
 
     def update_position(self, x, y):
         self.x = x
@@ -35,26 +47,39 @@ class Word2D:
 
 
 class Word3D:
-    def __init__(self, value, index, x = None, y = None, z = None):
+
+    __slots__ = ('value', 'length', 'x_sign', 'y_sign', 'z_sign', 'index', 'board_length', 'insertion_history', 'x', 'y', 'z')
+
+    def __init__(self, value, index, x = None, y = None, z = None, board_length = 0):
         self.value = value
         self.length = len(value)
         self.x_sign = 0
         self.y_sign = 0
         self.z_sign = 1
         self.index = index
-        self.insertion_history = set()
+        # One bit per (position, orientation) on a board_length sized cube.
+        self.board_length = board_length
+        self.insertion_history = bytearray((board_length ** 3 * 3 + 7) // 8)
         self.x = x
         self.y = y
         self.z = z
 
     def clear_insertion_history(self):
-        self.insertion_history.clear()
+        self.insertion_history[:] = bytes(len(self.insertion_history))
+
+    def set_board_length(self, board_length):
+        self.board_length = board_length
+        self.insertion_history = bytearray((board_length ** 3 * 3 + 7) // 8)
 
     def generate_insertion_entry(self):
-        return f'{self.x}-{self.y}-{self.z}-{self.x_sign}-{self.y_sign}-{self.z_sign}'
+        n = self.board_length
+        return ((self.z * n + self.y) * n + self.x) * 3 + self.y_sign + 2 * self.z_sign
 
     def add_insertion_entry(self, insertion):
-        self.insertion_history.add(insertion)
+        self.insertion_history[insertion >> 3] |= 1 << (insertion & 7)
+
+    def has_insertion_entry(self, insertion):
+        return self.insertion_history[insertion >> 3] >> (insertion & 7) & 1
 
     def update_position(self, x, y, z):
         self.x = x
@@ -73,4 +98,4 @@ class Word3D:
         x_sign, y_sign, z_sign = self.x_sign, self.y_sign, self.z_sign
         self.x_sign = z_sign
         self.y_sign = x_sign
-        self.z_sign = y_sign
\ No newline at end of file
+        self.z_sign = y_sign
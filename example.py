@@ -12,5 +12,8 @@ words = list(data.keys())
 clues = list(data.values())
 num_words = len(words)
 
-CrosswordPuzzle(title, subtitle, words, clues, scale_factor=1, max_depth=num_words, autogen=True, show_solution=False).generate2D()
-CrosswordPuzzle(title, subtitle, words, clues, scale_factor=1, max_depth=num_words, autogen=True, show_solution=False).generate3D()
\ No newline at end of file
+puzzle = CrosswordPuzzle(title, subtitle, words, clues, scale_factor=1, max_depth=num_words, autogen=True)
+
+# Each layout is searched once and rendered as both the blank puzzle and its solution.
+puzzle.generate2D(variants=['puzzle', 'solution'])
+puzzle.generate3D(variants=['puzzle', 'solution'])
\ No newline at end of file
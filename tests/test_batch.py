@@ -0,0 +1,29 @@
+import io
+import json
+from crossword import batch
+
+WORDS = {'python': 'A snake', 'typhoon': 'A storm', 'pencil': 'For writing', 'nectar': 'Bees collect it'}
+
+
+def test_iter_json_object_small_chunks(monkeypatch):
+    monkeypatch.setattr(batch, 'CHUNK_SIZE', 3)
+    data = {'first': {'python': 'A snake'}, 'second': ['a', 'b'], 'number': 12345.5, 'empty': {}}
+    assert list(batch.iter_json_object(io.StringIO(json.dumps(data)))) == list(data.items())
+    assert list(batch.iter_json_object(io.StringIO(' { } '))) == []
+
+
+def test_run_batch_reports_bad_records_and_continues():
+    lines = ['[1, 2]', '{"name": "fruit"', json.dumps({'name': 'fruit', 'words': WORDS}), '{"words": 5}']
+    output = io.StringIO()
+    num_puzzles, num_solved = batch.run_batch(batch.iter_jsonl(io.StringIO('\n'.join(lines))), output, workers=1,
+                                              dimensions=(2,), scale_factor=2, autogen=True)
+    results = sorted(map(json.loads, output.getvalue().splitlines()), key=lambda result: result['index'])
+    assert (num_puzzles, num_solved) == (4, 1)
+    assert [result['status'] for result in results] == ['error', 'error', 'ok', 'error']
+    assert results[0]['message'] == 'Line 1 is not a JSON object.'
+    assert results[2]['name'] == 'fruit'
+
+
+def test_solve_puzzle_rejects_non_dict_records():
+    result = batch.solve_puzzle(3, [1, 2], (2,), {})
+    assert result['status'] == 'error' and result['name'] == '3'
@@ -0,0 +1,19 @@
+import json
+import os
+from crossword.cache import LayoutCache
+
+
+def test_layout_cache_evicts_least_recently_used(tmp_path):
+    record = {'words': 'x' * 100}
+    entry_size = len(json.dumps(record))
+    cache = LayoutCache(str(tmp_path), max_size=2 * entry_size, memory_capacity=0)
+    cache.put('a', record)
+    os.utime(cache.get_path('a'), (1, 1))
+    cache.put('b', record)
+    os.utime(cache.get_path('b'), (2, 2))
+    # Reading 'a' makes 'b' the least recently used entry.
+    assert cache.get('a') == record
+    cache.put('c', record)
+    assert cache.get('b') is None
+    assert cache.get('a') == record
+    assert cache.get('c') == record
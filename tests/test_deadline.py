@@ -0,0 +1,22 @@
+import pytest
+from crossword.cube import Cube
+from crossword.grid import Grid
+from crossword.solver import SOLVERS, solve
+
+WORDS = ['algorithm', 'binary', 'compiler', 'debugger', 'encoding', 'function', 'generator', 'hashing', 'iterator',
+         'javascript', 'kernel', 'lambda', 'memory', 'network', 'object', 'pointer', 'queue', 'recursion', 'stack',
+         'thread', 'unicode', 'variable', 'widget', 'boolean', 'integer', 'string', 'module', 'package', 'library',
+         'syntax', 'runtime', 'closure', 'decorator', 'exception', 'inheritance', 'interface', 'protocol', 'socket',
+         'buffer', 'cache', 'array', 'vector', 'matrix', 'tensor', 'graph', 'tree', 'heap', 'trie', 'loop', 'branch']
+
+
+@pytest.mark.parametrize('engine, scale_factor', [(Grid, 1.6), (Cube, 1)])
+@pytest.mark.parametrize('solver', SOLVERS)
+def test_partial_layout_has_no_open_runs(engine, scale_factor, solver):
+    crossword = engine(WORDS, scale_factor, max_depth=len(WORDS), time_budget=0.05)
+    solve(crossword, solver)
+    layout = crossword.get_layout()
+    assert layout
+    # No run of letters is part of a missing word, and every word still crosses the rest.
+    assert crossword.get_open_runs() == []
+    assert crossword.get_connected_layout(layout) == layout
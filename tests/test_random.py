@@ -0,0 +1,26 @@
+import pytest
+from crossword.cube import Cube
+from crossword.grid import Grid
+
+WORDS = ['python', 'typhoon', 'pencil', 'nectar', 'orange', 'apple', 'lemon', 'melon', 'grape', 'peach', 'plum', 'kiwi']
+
+
+@pytest.mark.parametrize('engine, scale_factor', [(Grid, 2), (Cube, 1)])
+def test_seed_gives_the_same_layout(engine, scale_factor):
+    layouts = []
+    for _ in range(2):
+        crossword = engine(WORDS, scale_factor, seed=5)
+        assert crossword.generate()
+        layouts.append(crossword.get_layout())
+    assert layouts[0] == layouts[1]
+
+
+@pytest.mark.parametrize('ordering', ['length', 'constrained'])
+def test_seed_only_shuffles_ties(ordering):
+    for seed in range(10):
+        crossword = Grid(WORDS, 2, ordering=ordering, seed=seed)
+        order = list(crossword.get_word_order())
+        assert order[0] == 0
+        assert [crossword.word_ranks[i] for i in order] == sorted(crossword.word_ranks)
+        assert crossword.generate()
+        assert crossword.trail[0] == 0
@@ -0,0 +1,16 @@
+from crossword.runs import RunIndex
+
+
+def test_run_index_add_and_discard():
+    runs = RunIndex(5, 2)
+    for position, letter in zip((0, 1, 2), 'cat'):
+        runs.add(position, letter)
+    runs.add(5, 'o')
+    assert runs.get_letters(0, 0, 1) == 'cat'
+    assert runs.get_letters(2, 0, -1) == 'cat'
+    assert runs.get_letters(0, 1, 1) == 'co'
+    runs.discard(1)
+    assert not runs.is_occupied(1)
+    assert runs.get_letters(0, 0, 1) == 'c'
+    assert runs.get_letters(2, 0, 1) == 't'
+    assert runs.get_letters(1, 0, 1) == ''
@@ -0,0 +1,39 @@
+import json
+import threading
+import time
+import urllib.request
+from crossword.server import create_server
+
+WORDS = {'python': 'A snake', 'typhoon': 'A storm', 'pencil': 'For writing', 'nectar': 'Bees collect it'}
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, body)) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_server_round_trip():
+    server = create_server(port=0, verbose=False, workers=1, dimensions=(2,), autogen=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = 'http://{}:{}'.format(*server.server_address)
+        status, data = request(f'{url}/jobs', {'fruit': WORDS})
+        assert status == 202
+        job_id = data['jobs'][0]['id']
+        deadline = time.monotonic() + 60
+        while True:
+            status, job = request(f'{url}/jobs/{job_id}')
+            if job['status'] not in ('queued', 'running') or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        assert job['status'] == 'ok'
+        placed = {entry['word'] for entry in job['result']['results'][0]['layout']}
+        assert placed == set(WORDS)
+        status, metrics = request(f'{url}/metrics')
+        assert metrics['submitted'] == 1 and metrics['ok'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.jobs.shutdown()
@@ -0,0 +1,22 @@
+from crossword.grid import Grid
+from crossword.shared import SharedLayout
+
+WORDS = ['python', 'typhoon', 'pencil', 'nectar']
+
+
+def test_shared_layout_write_and_read():
+    crossword = Grid(WORDS, 2)
+    assert crossword.generate()
+    shared = SharedLayout(crossword.word_list, crossword.dimension, crossword.length)
+    reader = None
+    try:
+        shared.write(crossword)
+        reader = SharedLayout(crossword.word_list, crossword.dimension, crossword.length, shared.name)
+        assert reader.read_layout() == crossword.get_layout()
+        reader.load_words()
+        assert reader.get_unplaced_words() == []
+    finally:
+        if reader is not None:
+            reader.close()
+        shared.close()
+        shared.unlink()
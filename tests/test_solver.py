@@ -0,0 +1,42 @@
+import pytest
+from crossword.cube import Cube
+from crossword.grid import Grid
+from crossword.solver import solve
+
+# goat can only cross melon at first, but every layout has it crossing llama.
+DEFERRED_WORDS = ['melon', 'goat', 'llama', 'lion', 'mouse']
+# Without completing open runs first, a run only array could complete is found very late.
+OPEN_RUN_WORDS = ['buffer', 'array', 'string', 'panda', 'debugger', 'kernel', 'cache', 'inheritance', 'camel',
+                  'library', 'memory', 'peach', 'graph', 'zebra', 'runtime', 'protocol']
+
+
+def get_letter(crossword, word, i):
+    if crossword.dimension == 2:
+        return crossword.grid.get_letter(word.x + i * word.x_sign, word.y + i * word.y_sign)
+    return crossword.cube.get_letter(word.x + i * word.x_sign, word.y + i * word.y_sign, word.z + i * word.z_sign)
+
+
+def assert_solved(crossword):
+    assert crossword.get_unplaced_words() == []
+    assert crossword.check_runs()
+    for index in crossword.trail:
+        word = crossword.words[index]
+        assert ''.join(get_letter(crossword, word, i) for i in range(word.length)) == word.value
+
+
+@pytest.mark.parametrize('scale_factor', [2, 2.5, 3])
+def test_backtracking_places_a_word_crossing_later_words(scale_factor):
+    crossword = Grid(DEFERRED_WORDS, scale_factor)
+    assert solve(crossword, 'backtracking')
+    assert_solved(crossword)
+
+
+def test_backtracking_completes_open_runs():
+    crossword = Cube(OPEN_RUN_WORDS, 1, time_budget=30)
+    assert solve(crossword, 'backtracking')
+    assert_solved(crossword)
+
+
+def test_backtracking_proves_a_board_infeasible():
+    # Two words without a common letter can never cross.
+    assert solve(Grid(['abc', 'def'], 2), 'backtracking') is None